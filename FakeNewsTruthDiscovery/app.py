@@ -1,21 +1,36 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify
+import json
 import os
 import sqlite3
 from config import Config
-from utils.db import get_db_connection, init_db
+from utils.db import get_db_connection, init_db, release_connections, write_queue, fetch_page
 from utils.auth import hash_password, verify_password
+from utils.tasks import get_task, list_tasks
+from utils.ingest import ingest_csv, METADATA_COLUMNS
+from utils.telemetry import telemetry
 from werkzeug.utils import secure_filename
-import pandas as pd
 from datetime import datetime
 
-# Initialize DB on start
-init_db()
-
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+@app.teardown_appcontext
+def release_db(exc):
+    # Pooled connections outlive the request; never let one keep a
+    # transaction (and the write lock) open after it
+    release_connections()
+
+def create_app(prewarm=None):
+    """Initialize the DB and upload folder and start prewarming the models.
+
+    Importing this module has no side effects; WSGI servers should load
+    "app:create_app()". `prewarm` overrides Config.PREWARM_MODELS.
+    """
+    init_db()
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    from ml.warmup import start_prewarm
+    start_prewarm(prewarm)
+    return app
 
 # --- Routes ---
 
@@ -111,15 +126,12 @@ def upload_dataset():
             file.save(filepath)
             
             try:
-                # Basic check for CSV
-                df = pd.read_csv(filepath)
-                rows = len(df)
-                
-                conn = get_db_connection()
-                conn.execute('INSERT INTO datasets (filename, rows) VALUES (?, ?)', (filename, rows))
-                conn.commit()
-                conn.close()
-                flash(f'Dataset {filename} uploaded successfully with {rows} rows.')
+                # Validate and store rows chunk by chunk; uploads may not fit in memory
+                dataset_id, rows, rejected = ingest_csv(filepath, filename)
+                message = f'Dataset {filename} uploaded successfully with {rows} rows.'
+                if rejected:
+                    message += f' {rejected} rows without text or label were skipped.'
+                flash(message)
             except Exception as e:
                 flash(f"Error processing file: {e}")
                 
@@ -137,7 +149,7 @@ def start_training():
         return jsonify({'error': 'Unauthorized'}), 403
         
     algo = request.form.get('algorithm')
-    from ml.train import train_algorithm
+    from ml.jobs import submit_training
     
     try:
         conn = get_db_connection()
@@ -149,17 +161,59 @@ def start_training():
             
         dataset_path = os.path.join(app.config['UPLOAD_FOLDER'], dataset['filename'])
         
-        metrics = train_algorithm(dataset_path, algo)
+        # Training can take minutes; run it in the background and let the page poll
+        job_id = submit_training(dataset_path, algo)
         
-        return jsonify({'status': 'success', 'metrics': metrics})
+        return jsonify({'status': 'queued', 'job_id': job_id})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/admin/tasks')
+def list_training_jobs():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'tasks': list_tasks()})
+
+@app.route('/admin/tasks/<int:task_id>')
+def training_job_status(task_id):
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    task = get_task(task_id)
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    return jsonify(task)
+
 @app.route('/admin/predictions')
 def admin_predictions():
     if session.get('role') != 'admin':
         return redirect(url_for('login'))
-    return render_template('predict.html') 
+
+    conn = get_db_connection()
+    predictions, next_cursor = fetch_page(
+        conn, '''SELECT id, time, substr(text, 1, 80) AS snippet, predicted_label, prob,
+                        (SELECT label FROM feedback WHERE feedback.prediction_id = predictions_with_text.id
+                         ORDER BY feedback.id DESC LIMIT 1) AS confirmed_label
+                 FROM predictions_with_text''', 'time', cursor=request.args.get('cursor'))
+    labels = [row['label'] for row in conn.execute('SELECT DISTINCT label FROM dataofdatasets ORDER BY label')]
+    conn.close()
+    return render_template('admin/predictions.html', predictions=predictions, labels=labels,
+                           next_cursor=next_cursor)
+
+@app.route('/admin/predictions/<int:prediction_id>/confirm', methods=['POST'])
+def confirm_prediction(prediction_id):
+    if session.get('role') != 'admin':
+        return redirect(url_for('login'))
+
+    # Confirmed labels feed the next incremental update (ml/incremental.py)
+    label = request.form.get('label')
+    if label:
+        conn = get_db_connection()
+        with conn:
+            conn.execute('INSERT INTO feedback (prediction_id, label, user_id) VALUES (?, ?, ?)',
+                         (prediction_id, label, session['user_id']))
+        conn.close()
+        flash(f'Prediction {prediction_id} confirmed as {label}.')
+    return redirect(url_for('admin_predictions', cursor=request.args.get('cursor')))
 
 @app.route('/admin/monitor')
 def cloud_monitor():
@@ -167,15 +221,73 @@ def cloud_monitor():
         return redirect(url_for('login'))
     return render_template('admin/monitor.html')
 
+@app.route('/admin/monitor/feed')
+def monitor_feed():
+    # JSON for the monitor page and the dashboard/reports charts
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    feed = telemetry.snapshot()
+    conn = get_db_connection()
+    # Latest metrics row per model name
+    feed['models'] = [dict(row) for row in conn.execute('''
+        SELECT name, accuracy, f1, precision, recall, latency_ms, size_bytes, trained_at FROM models
+        WHERE id IN (SELECT MAX(id) FROM models GROUP BY name)
+        ORDER BY name
+    ''')]
+    # Before/after report of the last maintenance run (utils/maintenance.py)
+    last_run = conn.execute('SELECT finished_at, report FROM maintenance_runs ORDER BY id DESC LIMIT 1').fetchone()
+    feed['maintenance'] = None
+    if last_run:
+        feed['maintenance'] = dict(json.loads(last_run['report']), finished_at=last_run['finished_at'])
+    conn.close()
+    return jsonify(feed)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Scraped by Prometheus; per-process numbers (see utils/telemetry.py)
+    return Response(telemetry.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/admin/reports')
 def performance_reports():
     if session.get('role') != 'admin':
         return redirect(url_for('login'))
         
     conn = get_db_connection()
-    models = conn.execute('SELECT * FROM models').fetchall()
+    models, next_cursor = fetch_page(conn, 'SELECT * FROM models', 'trained_at',
+                                     cursor=request.args.get('cursor'))
+    # Every trial of the most recent hyperparameter search (ml/tuning.py)
+    trials = conn.execute('''
+        SELECT * FROM tuning_trials
+        WHERE run = (SELECT run FROM tuning_trials ORDER BY id DESC LIMIT 1)
+        ORDER BY algorithm, iteration DESC, rank
+    ''').fetchall()
     conn.close()
-    return render_template('admin/reports.html', models=models)
+    from ml.store import model_store
+    return render_template('admin/reports.html', models=models, next_cursor=next_cursor, trials=trials,
+                           current_bundle=model_store.current_bundle())
+
+@app.route('/admin/models/bundles')
+def list_model_bundles():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    from ml.store import model_store
+    return jsonify({'current': model_store.current_bundle(), 'bundles': model_store.bundles()})
+
+@app.route('/admin/models/rollback', methods=['POST'])
+def rollback_models():
+    if session.get('role') != 'admin':
+        return redirect(url_for('login'))
+    from ml.store import model_store
+    from ml.registry import registry
+
+    # Without a bundle name, go back to the parent of the serving bundle
+    try:
+        bundle = model_store.rollback(request.form.get('bundle') or None)
+        registry.invalidate()
+        flash(f'Now serving model bundle {bundle}.')
+    except LookupError as e:
+        flash(str(e))
+    return redirect(url_for('performance_reports'))
 
 @app.route('/admin/logs')
 def view_logs():
@@ -183,9 +295,10 @@ def view_logs():
         return redirect(url_for('login'))
     
     conn = get_db_connection()
-    logs = conn.execute('SELECT * FROM training_logs ORDER BY time DESC').fetchall()
+    logs, next_cursor = fetch_page(conn, 'SELECT id, algo, message, time FROM training_logs', 'time',
+                                   cursor=request.args.get('cursor'))
     conn.close()
-    return render_template('admin/logs.html', logs=logs)
+    return render_template('admin/logs.html', logs=logs, next_cursor=next_cursor)
 
 # --- User ---
 @app.route('/user')
@@ -202,33 +315,116 @@ def test_data():
     result = None
     if request.method == 'POST':
         text = request.form['text']
-        from ml.predict import predict_text
-        prediction = predict_text(text)
+        # Optional post metadata; models trained with it use it (ml/features.py)
+        metadata = {col: request.form[col] for col in METADATA_COLUMNS if request.form.get(col)} or None
+
+        # An earlier copy of the same story (a checked article or a training
+        # row) can answer on its own when DEDUP_SKIP_INFERENCE is set
+        match = None
+        if app.config['DEDUP_ENABLED']:
+            from ml.dedup import near_duplicates
+            near_duplicates.maybe_catch_up()
+            with telemetry.timer('near_duplicate_lookup'):
+                match = near_duplicates.lookup(text)
+        if match and app.config['DEDUP_SKIP_INFERENCE'] and match['label'] is not None:
+            telemetry.count('near_duplicate_answers')
+            prediction = {'label': match['label'], 'model': 'near-duplicate',
+                          'probability': match['probability'] if match['probability'] is not None else match['similarity']}
+        elif app.config['BATCHING_ENABLED']:
+            from ml.batcher import batcher
+            prediction = batcher.predict(text, metadata=metadata)
+        else:
+            from ml.predict import predict_text
+            prediction = predict_text(text, metadata=metadata)
         
-        result = prediction
+        result = dict(prediction, near_duplicate=match)
         
-        conn = get_db_connection()
-        conn.execute('INSERT INTO predictions (user_id, text, predicted_label, prob) VALUES (?, ?, ?, ?)',
-                     (session['user_id'], text, prediction['label'], prediction['probability']))
-        conn.commit()
-        conn.close()
+        # Queued and group-committed with other requests' inserts
+        write_queue.submit('INSERT INTO predictions (user_id, text, predicted_label, prob) VALUES (?, ?, ?, ?)',
+                           (session['user_id'], text, prediction['label'], prediction['probability']))
         
     return render_template('user/test.html', result=result)
 
+@app.route('/user/test/batch', methods=['POST'])
+def test_data_batch():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    # Either a JSON body {"texts": [...], "metadata": [{...}, ...], "algorithm": "..."}
+    # or a CSV upload with a 'text' column and optionally the metadata columns
+    max_texts = Config.BATCH_REQUEST_MAX_TEXTS
+    too_many = {'status': 'error', 'message': f'At most {max_texts} texts per request.'}
+    if 'file' in request.files:
+        import pandas as pd
+        try:
+            # One row past the limit is enough to reject the file
+            df = pd.read_csv(request.files['file'], usecols=lambda col: col == 'text' or col in METADATA_COLUMNS,
+                             nrows=max_texts + 1)
+            texts = [str(t) for t in df['text'].fillna('')]
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': f'Error processing file: {e}'}), 400
+        if len(texts) > max_texts:
+            return jsonify(too_many), 400
+        present = [col for col in METADATA_COLUMNS if col in df.columns]
+        metadata = df[present].astype(object).where(df[present].notna(), None).to_dict('records') if present else None
+        algo = request.form.get('algorithm')
+    else:
+        payload = request.get_json(silent=True) or {}
+        texts = payload.get('texts')
+        metadata = payload.get('metadata')
+        algo = payload.get('algorithm')
+        if not isinstance(texts, list):
+            return jsonify({'status': 'error', 'message': "Expected JSON body with a 'texts' list."}), 400
+        if len(texts) > max_texts:
+            return jsonify(too_many), 400
+        bad = next((i for i, t in enumerate(texts) if not isinstance(t, str)), None)
+        if bad is not None:
+            return jsonify({'status': 'error', 'message': f"'texts'[{bad}] is not a string."}), 400
+        if metadata is not None and (not isinstance(metadata, list) or len(metadata) != len(texts)
+                                     or not all(m is None or isinstance(m, dict) for m in metadata)):
+            return jsonify({'status': 'error',
+                            'message': "'metadata' must be a list with one object (or null) per text."}), 400
+
+    from ml.predict import predict_batch
+    try:
+        results = predict_batch(texts, algo, metadata)
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    rows = [(session['user_id'], text, r['label'], r['probability']) for text, r in zip(texts, results)]
+    with telemetry.timer('db_write'):
+        conn = get_db_connection()
+        with conn:
+            conn.executemany('INSERT INTO predictions (user_id, text, predicted_label, prob) VALUES (?, ?, ?, ?)', rows)
+        conn.close()
+    telemetry.count('db_rows_written', len(rows))
+
+    return jsonify({'status': 'success', 'count': len(results), 'results': results})
+
 @app.route('/user/history')
 def user_history():
     if 'user_id' not in session:
         return redirect(url_for('login'))
         
+    # Only a snippet of each article is shown, so don't pull full texts
     conn = get_db_connection()
-    history = conn.execute('SELECT * FROM predictions WHERE user_id = ? ORDER BY time DESC', (session['user_id'],)).fetchall()
+    history, next_cursor = fetch_page(
+        conn, 'SELECT id, time, substr(text, 1, 50) AS snippet, predicted_label, prob FROM predictions_with_text',
+        'time', where='user_id = ?', params=[session['user_id']], cursor=request.args.get('cursor'))
     conn.close()
-    return render_template('user/history.html', history=history)
+    return render_template('user/history.html', history=history, next_cursor=next_cursor)
+
+@app.route('/ready')
+def ready():
+    # Readiness probe: 503 until the models are loaded and warm (ml/warmup.py)
+    from ml.warmup import readiness
+    is_ready, details = readiness()
+    return jsonify(details), 200 if is_ready else 503
 
 if __name__ == '__main__':
-    # Auto-initialize DB and Admin
+    create_app()
+    # Auto-initialize Admin
     try:
-        init_db()
         conn = get_db_connection()
         if not conn.execute("SELECT * FROM users WHERE email='admin@svr.com'").fetchone():
             conn.execute("INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)",
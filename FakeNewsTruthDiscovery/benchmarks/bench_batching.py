@@ -0,0 +1,76 @@
+"""Compare per-request predict_text against the micro-batcher under concurrency.
+
+Run from the FakeNewsTruthDiscovery directory after training a model:
+
+    python -m benchmarks.bench_batching --requests 2000 --clients 1 8 64
+"""
+import argparse
+import statistics
+import threading
+import time
+import pandas as pd
+from config import Config
+from ml.predict import predict_text
+from ml.batcher import MicroBatcher
+
+
+def run(score, texts, clients, total):
+    latencies = []
+    lock = threading.Lock()
+    per_client = max(1, total // clients)
+
+    def client(offset):
+        local = []
+        for i in range(per_client):
+            text = texts[(offset + i) % len(texts)]
+            start = time.perf_counter()
+            score(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c * per_client,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default=f'{Config.BASE_DIR}/dataset.csv')
+    parser.add_argument('--algorithm', default=None)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--max-batch-size', type=int, default=Config.BATCH_MAX_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=Config.BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.dataset, usecols=['text'])['text'].astype(str).tolist()
+    batcher = MicroBatcher(args.max_batch_size, args.max_wait_ms)
+    engines = {
+        'direct': lambda text: predict_text(text, args.algorithm),
+        'batched': lambda text: batcher.predict(text, args.algorithm),
+    }
+
+    # Warm the model registry so the first timed request does not pay for loading
+    predict_text(texts[0], args.algorithm)
+
+    print(f"{'clients':>7} {'engine':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for clients in args.clients:
+        for name, score in engines.items():
+            r = run(score, texts, clients, args.requests)
+            print(f"{clients:>7} {name:>8} {r['throughput']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Measure worker cold start and memory with and without memory-mapped models.
+
+Starts N fresh worker processes per mode. Each loads the model registry,
+scores one text, and reports its load time, RSS and PSS. PSS divides shared
+pages among the processes mapping them, so it shows what mmap saves. All
+workers stay alive until every one has reported.
+
+    python -m benchmarks.bench_model_load --workers 4
+    python -m benchmarks.bench_model_load --synthetic 20000   # train bigger models first
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from config import Config
+
+
+def read_memory_kb():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                fields[parts[0][:-1].lower()] = int(parts[1])
+    return fields
+
+
+def worker(models_folder, mmap_mode, results, release):
+    Config.MODEL_MMAP_MODE = mmap_mode
+    from ml.registry import ModelRegistry
+    before = read_memory_kb()
+    start = time.perf_counter()
+    registry = ModelRegistry(models_folder)
+    snapshot = registry.snapshot()
+    load_time = time.perf_counter() - start
+    for name in snapshot.models:
+        vectorizer, model, _ = snapshot.resolve(name)
+        model.predict(vectorizer.transform(['warm up']) if vectorizer is not None else ['warm up'])
+    after = read_memory_kb()
+    results.put({'load_s': load_time, 'rss_kb': after['rss'] - before['rss'], 'pss_kb': after['pss'] - before['pss']})
+    release.wait()
+
+
+def train_synthetic(rows, folder):
+    from benchmarks.synthetic import write_corpus
+    from utils.db import init_db
+    init_db()
+    Config.MODELS_FOLDER = folder
+    import ml.train as train
+    from ml.store import model_store
+    model_store.root = folder
+    path = write_corpus(os.path.join(folder, 'corpus.csv'), rows)
+    train.train_all(path, ['Logistic Regression', 'SVM', 'Random Forest', 'Ensemble'])
+    os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', default=Config.MODELS_FOLDER)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--synthetic', type=int, default=0, help='train models on N synthetic rows first')
+    args = parser.parse_args()
+
+    models_folder = args.models
+    if args.synthetic:
+        models_folder = tempfile.mkdtemp(prefix='bench-models-')
+        train_synthetic(args.synthetic, models_folder)
+    from ml.store import ModelStore
+    bundle_folder, _ = ModelStore(models_folder).current()
+    sizes = {f: os.path.getsize(os.path.join(bundle_folder, f)) for f in os.listdir(bundle_folder) if f.endswith('.pkl')}
+    print('models:', ', '.join(f'{f} {s / 1e6:.1f} MB' for f, s in sorted(sizes.items())))
+
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'mode':>8} {'load s':>8} {'RSS MB/worker':>14} {'PSS MB/worker':>14}")
+    for label, mmap_mode in [('copy', ''), ('mmap', 'r')]:
+        results, release = ctx.Queue(), ctx.Event()
+        procs = [ctx.Process(target=worker, args=(models_folder, mmap_mode, results, release))
+                 for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        stats = [results.get() for _ in procs]
+        release.set()
+        for p in procs:
+            p.join()
+        mean = lambda key: sum(s[key] for s in stats) / len(stats)
+        print(f"{label:>8} {mean('load_s'):>8.3f} {mean('rss_kb') / 1024:>14.1f} {mean('pss_kb') / 1024:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
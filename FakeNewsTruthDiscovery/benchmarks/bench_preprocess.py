@@ -0,0 +1,60 @@
+"""Benchmark text cleaning on dataset.csv scaled up, and check output parity.
+
+Run from the FakeNewsTruthDiscovery directory:
+
+    python -m benchmarks.bench_preprocess --rows 1000000 --workers 4
+
+--unique appends the row number to every text so that deduplication in
+clean_series cannot help (worst case for real-world corpora).
+"""
+import argparse
+import re
+import time
+import pandas as pd
+from config import Config
+from ml.preprocess import clean_series, clean_texts
+
+
+def legacy_clean_text(text):
+    # The per-row implementation previously copied in ml/train.py and ml/predict.py
+    text = str(text).lower()
+    text = re.sub(r'\W', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f'{label:<28} {time.perf_counter() - start:8.2f} s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default=f'{Config.BASE_DIR}/dataset.csv')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--unique', action='store_true')
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.dataset, usecols=['text'])['text']
+    texts = pd.Series(base.tolist() * (args.rows // len(base) + 1)).iloc[:args.rows].reset_index(drop=True)
+    if args.unique:
+        texts = texts + ' #' + texts.index.astype(str)
+    print(f'{len(texts)} rows, {texts.nunique()} distinct texts')
+
+    legacy = timed('legacy .apply', lambda: texts.apply(legacy_clean_text))
+    single = timed('clean_texts (1 process)', lambda: clean_texts(texts))
+    series = timed('clean_series (dedup)', lambda: clean_series(texts))
+    parallel = timed(f'clean_texts ({args.workers} processes)', lambda: clean_texts(texts, workers=args.workers))
+
+    expected = legacy.tolist()
+    for name, result in [('clean_texts', single), ('clean_series', series.tolist()), ('parallel', parallel)]:
+        if result != expected:
+            raise SystemExit(f'{name} output differs from the legacy cleaner')
+    print('all outputs byte-identical to legacy clean_text')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Worker startup report: import time, time to ready and first-request latency.
+
+Each run is a fresh interpreter that imports app, calls create_app() with
+one PREWARM_MODELS mode, waits for /ready and then times its first and
+second /user/test requests. With 'off' the first request pays for loading
+the models; with prewarming that cost moves before /ready turns 200. The
+slowest modules imported by `import app` are listed from -X importtime.
+Predictions are written to a throwaway database.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --json startup.json   # keep for later comparison
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ['off', 'blocking', 'background']
+
+
+def child(mode, db_path):
+    start = time.perf_counter()
+    from config import Config
+    Config.DB_PATH = db_path
+    import app as app_module
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = app_module.create_app(prewarm=mode)
+    create_s = time.perf_counter() - start
+
+    client = app.test_client()
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.005)
+    ready_s = time.perf_counter() - start
+
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['role'] = 'user'
+    requests = []
+    for text in ['Breaking: scientists confirm the moon is made of cheese', 'Markets closed higher on Friday']:
+        start = time.perf_counter()
+        response = client.post('/user/test', data={'text': text})
+        requests.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    print(json.dumps({'import_s': import_s, 'create_app_s': create_s, 'ready_s': ready_s,
+                      'first_request_s': requests[0], 'second_request_s': requests[1]}))
+
+
+def run_child(mode):
+    with tempfile.TemporaryDirectory(prefix='bench-startup-') as tmp:
+        out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', '--child', mode,
+                              '--db', os.path.join(tmp, 'bench.db')],
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top):
+    """Cumulative microseconds of the modules `import app` pulls in directly."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                         capture_output=True, text=True, check=True)
+    direct = []
+    for line in out.stderr.splitlines():
+        parts = line.split('|')
+        # Depth is the indentation of the module name; 3 spaces = imported by app itself
+        if len(parts) == 3 and parts[1].strip().isdigit() and parts[2].startswith('   ') \
+                and not parts[2].startswith('    '):
+            direct.append((int(parts[1]), parts[2].strip()))
+    return sorted(direct, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--json', help='also write the medians to this file')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.db)
+        return
+
+    print('slowest imports of `import app`:')
+    for micros, module in slowest_imports(8):
+        print(f'  {micros / 1000:>8.1f} ms  {module}')
+
+    results = {}
+    print(f"{'mode':>10} {'import s':>9} {'create_app s':>13} {'ready s':>8} {'1st req ms':>11} {'2nd req ms':>11}")
+    for mode in args.modes:
+        runs = [run_child(mode) for _ in range(args.runs)]
+        results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        r = results[mode]
+        print(f"{mode:>10} {r['import_s']:>9.3f} {r['create_app_s']:>13.3f} {r['ready_s']:>8.3f} "
+              f"{r['first_request_s'] * 1000:>11.1f} {r['second_request_s'] * 1000:>11.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'created_at': time.time(), 'modes': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
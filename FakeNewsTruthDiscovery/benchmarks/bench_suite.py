@@ -0,0 +1,281 @@
+"""End-to-end benchmark suite for training and inference, with baseline comparison.
+
+For every corpus size, a synthetic corpus shaped like dataset.csv
+(benchmarks/synthetic.py, fixed seed) is generated once and cached. Then
+each stage is timed:
+
+    csv_load          pandas.read_csv of the corpus
+    clean             ml.preprocess.clean_series (as load_and_preprocess does)
+    tfidf_fit         TF-IDF fit_transform on the 80% training split
+    tfidf_transform   transform of the 20% test split
+    fit:<algorithm>   ml.train.build_model(algorithm).fit
+    predict_single    ml.predict.predict_text, one text per call
+    predict_batch     ml.predict.predict_batch, 1000 texts per call
+    db_insert         prediction INSERTs through the write-behind queue
+
+Each stage records its wall time, peak RSS while it ran (VmHWM, reset
+before every stage), and throughput where that makes sense. The fitted
+models are published to a temporary model store, so predict_* exercise the
+real serving path (prediction cache off); inserts go to a temporary
+database. Nothing touches the network or the app's own models/database.
+
+Results are written as JSON. With --baseline, every stage is compared
+against an earlier results file and stages slower by more than
+--tolerance are flagged; --fail-on-regression then exits with status 1.
+
+    python -m benchmarks.bench_suite --sizes 10000 100000 1000000 --output results.json
+    python -m benchmarks.bench_suite --sizes 10000 --baseline results.json --fail-on-regression
+
+Kernel SVM and the forests grow super-linearly with the data, so
+algorithms are skipped above ROW_LIMITS unless --no-limits is given.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from config import Config
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_ALGORITHMS = ['Logistic Regression', 'Linear SVM', 'SVM', 'Random Forest', 'XGBoost', 'Ensemble']
+# Largest training split each algorithm is fitted on by default
+ROW_LIMITS = {'SVM': 20_000, 'Ensemble': 20_000, 'Random Forest': 200_000, 'XGBoost': 200_000}
+
+SINGLE_PREDICTIONS = 200
+BATCH_SIZE = 1000
+INSERT_ROWS = 50_000
+
+
+def read_peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak of the whole run, in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    # Linux >= 4.0: writing 5 to clear_refs resets VmHWM to the current RSS
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, stage, fn, items=None, repeat=None):
+        """Time fn() (median of `repeat` runs) and record it; returns fn's last result."""
+        timings = []
+        reset_peak_rss()
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        seconds = statistics.median(timings)
+        record = {'seconds': seconds, 'peak_rss_mb': read_peak_rss_mb()}
+        if items:
+            record['items'] = items
+            record['items_per_s'] = items / seconds if seconds else None
+        self.results[stage] = record
+        print(f'  {stage:<40} {seconds:>9.3f} s  {record["peak_rss_mb"]:>8.0f} MB'
+              + (f'  {record["items_per_s"]:>12,.0f} /s' if items else ''), flush=True)
+        return result
+
+    def add(self, stage, record):
+        self.results[stage] = record
+        detail = record.get('error') or record.get('skipped') or ''
+        print(f'  {stage:<40} {"-":>9}    {detail}', flush=True)
+
+
+def corpus_path(corpus_dir, rows, seed):
+    from benchmarks.synthetic import write_corpus
+    path = os.path.join(corpus_dir, f'corpus-{rows}-{seed}.csv')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        tmp_path = path + '.tmp'
+        write_corpus(tmp_path, rows, seed=seed)
+        os.replace(tmp_path, path)
+        print(f'  generated {path} in {time.perf_counter() - start:.1f} s', flush=True)
+    return path
+
+
+def bench_size(rows, args, recorder):
+    import numpy as np
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.model_selection import train_test_split
+    from ml.preprocess import clean_series
+    from ml.train import build_model
+    from ml.store import model_store
+    from ml.registry import registry
+    from ml.predict import predict_batch, predict_text
+    from utils.db import write_queue
+
+    path = corpus_path(args.corpus_dir, rows, args.seed)
+    df = recorder.run('csv_load', lambda: pd.read_csv(path), items=rows)
+    cleaned = recorder.run('clean', lambda: clean_series(df['text'], workers=Config.PREPROCESS_WORKERS), items=rows)
+    texts_train, texts_test, y_train, y_test = train_test_split(cleaned, df['label'], test_size=0.2, random_state=42)
+    raw_texts = df['text'].astype(str).tolist()
+    del df, cleaned
+
+    vectorizer = TfidfVectorizer(max_features=Config.TFIDF_MAX_FEATURES)
+    X_train = recorder.run('tfidf_fit', lambda: vectorizer.fit_transform(texts_train), items=len(texts_train))
+    recorder.run('tfidf_transform', lambda: vectorizer.transform(texts_test), items=len(texts_test))
+
+    fitted = {}
+    for algo_name in args.algorithms:
+        limit = ROW_LIMITS.get(algo_name)
+        if limit and not args.no_limits and X_train.shape[0] > limit:
+            recorder.add(f'fit:{algo_name}', {'skipped': f'over {limit} training rows (--no-limits to run)'})
+            continue
+        try:
+            # Fits are slow and deterministic enough: always a single run
+            fitted[algo_name] = recorder.run(f'fit:{algo_name}', lambda: build_model(algo_name).fit(X_train, y_train),
+                                             items=X_train.shape[0], repeat=1)
+        except Exception as e:
+            recorder.add(f'fit:{algo_name}', {'error': f'{type(e).__name__}: {str(e).strip().splitlines()[-1]}'})
+    del X_train
+
+    if fitted:
+        with model_store.stage() as bundle:
+            vectorizer_file = bundle.add_vectorizer(vectorizer)
+            for algo_name, model in fitted.items():
+                bundle.add_model(algo_name, model, vectorizer_file)
+            bundle.publish()
+        registry.invalidate()
+        serving = args.serving_model if args.serving_model in fitted else next(iter(fitted))
+        rng = np.random.default_rng(args.seed)
+        sample = [raw_texts[i] for i in rng.integers(0, len(raw_texts), max(SINGLE_PREDICTIONS, BATCH_SIZE))]
+
+        predict_text(sample[0], serving)  # first call pays for loading the bundle
+        latencies = []
+
+        def single():
+            for text in sample[:SINGLE_PREDICTIONS]:
+                start = time.perf_counter()
+                predict_text(text, serving)
+                latencies.append(time.perf_counter() - start)
+        recorder.run(f'predict_single:{serving}', single, items=SINGLE_PREDICTIONS)
+        latencies.sort()
+        recorder.results[f'predict_single:{serving}'].update(
+            p50_ms=latencies[len(latencies) // 2] * 1000, p99_ms=latencies[int(len(latencies) * 0.99)] * 1000)
+        recorder.run(f'predict_batch:{serving}', lambda: predict_batch(sample[:BATCH_SIZE], serving), items=BATCH_SIZE)
+
+    def insert():
+        for i in range(INSERT_ROWS):
+            write_queue.submit('INSERT INTO predictions (user_id, text, predicted_label, prob) VALUES (?, ?, ?, ?)',
+                               (1, raw_texts[i % len(raw_texts)], 'real', 0.5))
+        write_queue.flush()
+    recorder.run('db_insert', insert, items=INSERT_ROWS)
+
+
+def environment():
+    import numpy
+    import pandas
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Config.BASE_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'numpy': numpy.__version__, 'pandas': pandas.__version__, 'sklearn': sklearn.__version__,
+        'commit': commit, 'tfidf_max_features': Config.TFIDF_MAX_FEATURES,
+        'preprocess_workers': Config.PREPROCESS_WORKERS, 'serving_engine': Config.SERVING_ENGINE,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline per stage; returns the regressed (size, stage) pairs."""
+    regressions = []
+    print(f"\n{'size':>9} {'stage':<40} {'baseline s':>11} {'current s':>10} {'ratio':>7}")
+    for size, stages in results.items():
+        for stage, record in stages.items():
+            before = baseline.get(size, {}).get(stage, {}).get('seconds')
+            now = record.get('seconds')
+            if before is None or now is None:
+                continue
+            ratio = now / before if before else float('inf')
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = 'SLOWER'
+                regressions.append((size, stage))
+            elif ratio < 1 - tolerance:
+                flag = 'faster'
+            print(f'{size:>9} {stage:<40} {before:>11.3f} {now:>10.3f} {ratio:>6.2f}x {flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--algorithms', nargs='+', default=DEFAULT_ALGORITHMS)
+    parser.add_argument('--serving-model', default='Logistic Regression', help='model used by predict_*')
+    parser.add_argument('--no-limits', action='store_true', help='fit every algorithm at every size')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per non-fit stage; the median is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'fakenews-bench-corpora'))
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before flagging')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+    os.makedirs(args.corpus_dir, exist_ok=True)
+
+    # Point the models folder and database at scratch copies before anything
+    # that reads them is imported, and measure uncached predictions.
+    scratch = tempfile.mkdtemp(prefix='bench-suite-')
+    Config.MODELS_FOLDER = os.path.join(scratch, 'models')
+    Config.DB_PATH = os.path.join(scratch, 'bench.db')
+    Config.PREDICTION_CACHE_ENABLED = False
+    Config.PREWARM_MODELS = 'off'
+    os.makedirs(Config.MODELS_FOLDER)
+    from utils.db import init_db
+    init_db()
+
+    started = time.time()
+    results = {}
+    try:
+        for rows in args.sizes:
+            print(f'{rows:,} rows', flush=True)
+            recorder = Recorder(args.repeat)
+            bench_size(rows, args, recorder)
+            results[str(rows)] = recorder.results
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {'created_at': started, 'environment': environment(), 'sizes': args.sizes,
+              'algorithms': args.algorithms, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nwrote {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('cpus') != os.cpu_count():
+            print('note: the baseline was recorded with a different CPU count')
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Kernel SVC(probability=True) vs the calibrated linear SVM ('Linear SVM').
+
+For each corpus size: fit time, single-document predict_proba latency and
+weighted F1 on a 20% holdout, using the same TF-IDF features as training.
+
+    python -m benchmarks.bench_svm --rows 5000 10000 20000
+"""
+import argparse
+import time
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from benchmarks.synthetic import make_corpus
+from ml.preprocess import clean_texts
+from ml.train import build_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[5000, 10000, 20000])
+    parser.add_argument('--docs', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'algorithm':<11} {'fit s':>8} {'1-doc ms':>9} {'F1':>7}")
+    for rows in args.rows:
+        df = make_corpus(rows)
+        X = TfidfVectorizer(max_features=5000).fit_transform(clean_texts(df['text']))
+        X_train, X_test, y_train, y_test = train_test_split(X, df['label'], test_size=0.2, random_state=42)
+        for algo_name in ['SVM', 'Linear SVM']:
+            model = build_model(algo_name)
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_s = time.perf_counter() - start
+
+            docs = [X_test[i] for i in range(min(args.docs, X_test.shape[0]))]
+            start = time.perf_counter()
+            for row in docs:
+                model.predict_proba(row)
+            latency_ms = (time.perf_counter() - start) / len(docs) * 1000
+
+            f1 = f1_score(y_test, model.predict(X_test), average='weighted')
+            print(f'{rows:>7} {algo_name:<11} {fit_s:>8.2f} {latency_ms:>9.3f} {f1:>7.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Synthetic corpora shaped like dataset.csv, for benchmarks that need scale.
+
+Each label draws most of its words from its own slice of a generated
+vocabulary, so models have something to learn and vocabularies grow with
+the corpus the way scraped news does.
+"""
+import numpy as np
+import pandas as pd
+
+LABELS = ['real', 'fake', 'propaganda']
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+
+def make_vocabulary(size, seed=0):
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    lengths = rng.integers(3, 11, size)
+    return np.array([''.join(rng.choice(letters, n)) for n in lengths])
+
+
+def make_corpus(rows, vocab_size=50000, words_per_text=(40, 120), seed=0):
+    """DataFrame with dataset.csv's columns and `rows` synthetic articles."""
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary(vocab_size, seed)
+    labels = rng.integers(0, len(LABELS), rows)
+    lengths = rng.integers(words_per_text[0], words_per_text[1], rows)
+
+    # 70% shared words, 30% from the label's own third of the vocabulary
+    slice_size = vocab_size // len(LABELS)
+    texts = []
+    for label, n in zip(labels, lengths):
+        shared = rng.integers(0, vocab_size, int(n * 0.7))
+        own = rng.integers(label * slice_size, (label + 1) * slice_size, n - len(shared))
+        words = vocab[np.concatenate([shared, own])]
+        rng.shuffle(words)
+        texts.append(' '.join(words) + '.')
+
+    return pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'text': texts,
+        'label': np.array(LABELS)[labels],
+        'author_followers': rng.integers(0, 1_000_000, rows),
+        'author_verified': rng.integers(0, 2, rows),
+        'retweets': rng.integers(0, 20_000, rows),
+        'likes': rng.integers(0, 100_000, rows),
+        'shares': rng.integers(0, 20_000, rows),
+        'credibility_score': rng.random(rows).round(3),
+        'sentiment': np.array(SENTIMENTS)[rng.integers(0, 3, rows)],
+    })
+
+
+def write_corpus(path, rows, **kwargs):
+    make_corpus(rows, **kwargs).to_csv(path, index=False)
+    return path
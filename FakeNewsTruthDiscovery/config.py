@@ -5,8 +5,100 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     DB_PATH = os.path.join(BASE_DIR, 'database', 'fakenews.db')
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-    MODELS_FOLDER = os.path.join(BASE_DIR, 'ml', 'models')
+    # Can point at an exported artifact directory (python -m ml.artifacts export)
+    MODELS_FOLDER = os.environ.get('MODELS_FOLDER') or os.path.join(BASE_DIR, 'ml', 'models')
+    ARTIFACTS_FOLDER = os.path.join(BASE_DIR, 'ml', 'artifacts')
     LOGS_FOLDER = os.path.join(BASE_DIR, 'logs')
-    
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+    # Parquet files of predictions and training logs past retention
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER') or os.path.join(BASE_DIR, 'archive')
+
+    # Seconds between checks of MODELS_FOLDER for retrained/new models
+    MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 2.0))
+    # Memory-map model arrays read-only so workers share them ('' to disable)
+    MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r')
+    # 'compiled' scores linear models with ml/fastpath.py; others use sklearn
+    SERVING_ENGINE = os.environ.get('SERVING_ENGINE', 'sklearn')
+
+    # Micro-batching of concurrent /user/test requests (see ml/batcher.py).
+    # Larger batches raise throughput; a longer wait adds latency at low load.
+    BATCHING_ENABLED = os.environ.get('BATCHING_ENABLED', '1') == '1'
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 32))
+    BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+    # Most texts (JSON list or CSV rows) accepted by one /user/test/batch request
+    BATCH_REQUEST_MAX_TEXTS = int(os.environ.get('BATCH_REQUEST_MAX_TEXTS', 10000))
+
+    # Processes available for background training jobs (see ml/jobs.py)
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 1))
+
+    # SVM variant inside the Ensemble: 'SVM' (kernel SVC) or 'Linear SVM'
+    ENSEMBLE_SVM = os.environ.get('ENSEMBLE_SVM', 'SVM')
+
+    # Processes used to clean text when loading a dataset for training
+    PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', 1))
+
+    # Rows per chunk when streaming CSVs (upload ingestion, streaming training)
+    INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 50000))
+    # Feature space of the stateless HashingVectorizer used by streaming training
+    HASHING_N_FEATURES = int(os.environ.get('HASHING_N_FEATURES', 2 ** 20))
+
+    # Vocabulary size of the TF-IDF vectorizer fitted by batch training
+    TFIDF_MAX_FEATURES = int(os.environ.get('TFIDF_MAX_FEATURES', 5000))
+    # Append the scaled post metadata (followers, likes, credibility, ...) to
+    # the TF-IDF features when the training data has it (see ml/features.py)
+    METADATA_FEATURES = os.environ.get('METADATA_FEATURES', '1') == '1'
+
+    # Compact training mode (see ml/compact.py): chi2 vocabulary size, L1
+    # strength for L1 selection, and the size limits of the compact forest
+    COMPACT_VOCABULARY = int(os.environ.get('COMPACT_VOCABULARY', 1000))
+    COMPACT_L1_C = float(os.environ.get('COMPACT_L1_C', 1.0))
+    COMPACT_TREES = int(os.environ.get('COMPACT_TREES', 50))
+    COMPACT_MAX_DEPTH = int(os.environ.get('COMPACT_MAX_DEPTH', 20))
+
+    # Hyperparameter search (see ml/tuning.py): CV folds, successive-halving
+    # factor and parallel fits (-1 = all cores)
+    TUNING_FOLDS = int(os.environ.get('TUNING_FOLDS', 5))
+    TUNING_HALVING_FACTOR = int(os.environ.get('TUNING_HALVING_FACTOR', 3))
+    TUNING_JOBS = int(os.environ.get('TUNING_JOBS', -1))
+
+    # SQLite tuning (see utils/db.py). Prediction and training-log inserts go
+    # through a write-behind queue committed in batches.
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+    DB_WRITE_BEHIND = os.environ.get('DB_WRITE_BEHIND', '1') == '1'
+    DB_WRITE_BATCH_SIZE = int(os.environ.get('DB_WRITE_BATCH_SIZE', 500))
+    DB_WRITE_FLUSH_MS = float(os.environ.get('DB_WRITE_FLUSH_MS', 50))
+    # Longest wait between retries of a write-behind batch that hit a locked database
+    DB_WRITE_MAX_BACKOFF_MS = float(os.environ.get('DB_WRITE_MAX_BACKOFF_MS', 2000))
+
+    # Database maintenance (see utils/maintenance.py): days predictions
+    # (without feedback) and training logs stay in SQLite before they are
+    # archived (0 keeps them forever), and rows per maintenance transaction
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 90))
+    MAINTENANCE_BATCH_SIZE = int(os.environ.get('MAINTENANCE_BATCH_SIZE', 2000))
+
+    # Prediction result cache (see ml/cache.py)
+    PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', '1') == '1'
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+    PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 24 * 3600))
+    PREDICTION_CACHE_PERSIST = os.environ.get('PREDICTION_CACHE_PERSIST', '1') == '1'
+
+    # Near-duplicate lookup on /user/test (see ml/dedup.py): minimum estimated
+    # Jaccard similarity of word 3-grams, whether a match replaces model
+    # inference, and seconds between background index updates
+    DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', '1') == '1'
+    DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.8))
+    DEDUP_SKIP_INFERENCE = os.environ.get('DEDUP_SKIP_INFERENCE', '0') == '1'
+    DEDUP_REFRESH_INTERVAL = float(os.environ.get('DEDUP_REFRESH_INTERVAL', 5))
+    # Rows signed and indexed per write transaction by the index update
+    DEDUP_BATCH_SIZE = int(os.environ.get('DEDUP_BATCH_SIZE', 200))
+
+    # Per-stage latency histograms and counters (see utils/telemetry.py),
+    # exported on /metrics and the admin monitor page
+    TELEMETRY_ENABLED = os.environ.get('TELEMETRY_ENABLED', '1') == '1'
+
+    # Rows per page on history, logs and reports
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+
+    # Model loading at worker start (see ml/warmup.py): 'background' (serve
+    # at once, /ready is 503 until warm), 'blocking' or 'off' (load on first use)
+    PREWARM_MODELS = os.environ.get('PREWARM_MODELS', 'background')
@@ -0,0 +1,2 @@
+# Lets `pytest` find the app's top-level packages (ml, utils, config) from
+# any working directory
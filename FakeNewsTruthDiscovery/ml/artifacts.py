@@ -0,0 +1,114 @@
+"""Model artifact files: memory-mapped loading and versioned exports.
+
+Models are stored as uncompressed joblib pickles, whose numpy arrays (TF-IDF
+idf_, linear coef_, SVC support vectors, ...) can be memory-mapped read-only
+on load. Every worker that maps the same file shares those pages through the
+OS page cache instead of holding its own copy.
+
+    python -m ml.artifacts export [--dest DIR]
+    python -m ml.artifacts verify DIR
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import joblib
+from config import Config
+
+MANIFEST_FILE = 'manifest.json'
+
+def load_model_file(path, mmap_mode=None):
+    if mmap_mode is None:
+        mmap_mode = Config.MODEL_MMAP_MODE or None
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_artifact(models_folder=None, dest_root=None):
+    """Write the current model bundle (or `models_folder`) as a new versioned artifact directory.
+
+    Every .pkl is re-dumped uncompressed (so its arrays can be mapped) next to
+    a manifest recording library versions and per-file sha256. The directory
+    is built under a temporary name and renamed into place, so a half-written
+    artifact is never visible. The manifest keeps the bundle's model ->
+    vectorizer bindings, so the directory can be served directly by pointing
+    MODELS_FOLDER at it. Returns its path.
+    """
+    import sklearn
+    from ml.store import ModelStore, flat_manifest
+
+    if models_folder is None:
+        models_folder, source = ModelStore().current()
+    else:
+        source = flat_manifest(models_folder)
+    dest_root = dest_root or Config.ARTIFACTS_FOLDER
+    os.makedirs(dest_root, exist_ok=True)
+
+    names = sorted(f for f in os.listdir(models_folder) if f.endswith('.pkl'))
+    if not names:
+        raise ValueError(f'No models to export in {models_folder}')
+
+    staging = tempfile.mkdtemp(dir=dest_root, prefix='.export-')
+    try:
+        files = {}
+        for name in names:
+            target = os.path.join(staging, name)
+            joblib.dump(joblib.load(os.path.join(models_folder, name)), target)
+            files[name] = {'sha256': file_sha256(target), 'size': os.path.getsize(target)}
+
+        content_hash = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+        version = f"{time.strftime('%Y%m%d%H%M%S')}-{content_hash}"
+        manifest = {
+            'version': version,
+            'created_at': time.time(),
+            'sklearn_version': sklearn.__version__,
+            'joblib_version': joblib.__version__,
+            'files': files,
+            'bundle': source['bundle'],
+            'models': source['models'],
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        path = os.path.join(dest_root, version)
+        os.rename(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return path
+
+def verify_artifact(path):
+    """Check every file against the manifest; returns the manifest or raises ValueError."""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    for name, meta in manifest['files'].items():
+        if file_sha256(os.path.join(path, name)) != meta['sha256']:
+            raise ValueError(f'{name} does not match the manifest checksum')
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or verify model artifacts.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export')
+    export.add_argument('--models', default=None)
+    export.add_argument('--dest', default=None)
+    verify = sub.add_parser('verify')
+    verify.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(export_artifact(args.models, args.dest))
+    else:
+        manifest = verify_artifact(args.path)
+        print(f"{manifest['version']}: {len(manifest['files'])} files OK")
+
+if __name__ == '__main__':
+    main()
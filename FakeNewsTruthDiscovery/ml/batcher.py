@@ -0,0 +1,99 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+from ml.predict import predict_batch
+from utils.telemetry import telemetry
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-text predictions into small batches.
+
+    Request threads call `predict()` and block on a future. One worker thread
+    takes the first queued request, keeps collecting until `max_batch_size`
+    requests are queued or `max_wait_ms` has passed, then scores the whole
+    batch with one `predict_batch` call per requested model.
+    """
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None):
+        self.max_batch_size = max_batch_size or Config.BATCH_MAX_SIZE
+        if max_wait_ms is None:
+            max_wait_ms = Config.BATCH_MAX_WAIT_MS
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                    worker.start()
+                    self._worker = worker
+
+    def submit(self, text, algo_name=None, metadata=None):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, algo_name, metadata, future))
+        return future
+
+    def predict(self, text, algo_name=None, metadata=None):
+        """Drop-in replacement for predict_text that goes through the batcher."""
+        return self.submit(text, algo_name, metadata).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                groups = {}
+                for item in batch:
+                    groups.setdefault(item[1], []).append(item)
+                for algo_name, items in groups.items():
+                    self._score_group(algo_name, items)
+            except Exception as e:
+                # Keep the worker alive: if it died, every later predict()
+                # would wait on its future forever
+                print(f'Micro-batcher failed a batch: {type(e).__name__}: {e}', file=sys.stderr)
+                telemetry.count('batcher_errors')
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self):
+        return {'queue_depth': self._queue.qsize(), 'max_batch_size': self.max_batch_size}
+
+    def _score_group(self, algo_name, items):
+        telemetry.count('batches')
+        telemetry.count('batched_requests', len(items))
+        try:
+            results = predict_batch([text for text, _, _, _ in items], algo_name,
+                                    [metadata for _, _, metadata, _ in items])
+        except LookupError as e:
+            error = {'label': 'Error', 'probability': 0.0, 'message': str(e)}
+            results = [dict(error) for _ in items]
+        except Exception as e:
+            for _, _, _, future in items:
+                future.set_exception(e)
+            return
+        for (_, _, _, future), result in zip(items, results):
+            future.set_result(result)
+
+
+batcher = MicroBatcher()
+telemetry.register_collector('batcher', batcher.stats)
@@ -0,0 +1,172 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from utils.db import get_db_connection, write_queue
+from utils.telemetry import telemetry
+
+
+class PredictionCache:
+    """LRU + TTL cache of prediction results.
+
+    Keys combine a hash of the cleaned text with the model file and the
+    registry snapshot version, so retraining (which changes the files and
+    therefore the version) makes every old entry unreachable; the memory tier
+    is also cleared as soon as a new version is seen. The memory tier holds at
+    most `max_entries` results. With `persist`, results are also written to
+    the prediction_cache table so warm entries survive a restart; rows past
+    the TTL are deleted from it every PURGE_INTERVAL seconds.
+    """
+
+    PURGE_INTERVAL = 300
+    # Seconds between checks for the prediction_cache table while it is missing
+    TABLE_RECHECK_INTERVAL = 30
+
+    def __init__(self, max_entries=None, ttl=None, persist=None):
+        self.max_entries = max_entries or Config.PREDICTION_CACHE_SIZE
+        self.ttl = Config.PREDICTION_CACHE_TTL if ttl is None else ttl
+        self.persist = Config.PREDICTION_CACHE_PERSIST if persist is None else persist
+        self._entries = OrderedDict()
+        self._version = None
+        self._table_found = False
+        self._table_checked_at = None
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.persistent_hits = self.evictions = 0
+
+    def _persist_enabled(self):
+        # The table comes from init_db; until it exists (e.g. scripts that
+        # never ran it) the tier is skipped, looking again now and then
+        if not self.persist:
+            return False
+        if self._table_found:
+            return True
+        now = time.monotonic()
+        if self._table_checked_at is not None and now - self._table_checked_at < self.TABLE_RECHECK_INTERVAL:
+            return False
+        self._table_checked_at = now
+        try:
+            conn = get_db_connection()
+            found = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prediction_cache'").fetchone()
+            conn.close()
+        except sqlite3.Error:
+            found = None
+        self._table_found = found is not None
+        return self._table_found
+
+    @staticmethod
+    def key(cleaned_text, model_file, version):
+        digest = hashlib.sha256(cleaned_text.encode('utf-8')).hexdigest()
+        return f'{version}:{model_file}:{digest}'
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            if self._version is not None and self._persist_enabled():
+                # Rows for older model files can never be hit again
+                write_queue.submit('DELETE FROM prediction_cache WHERE version != ?', (version,))
+            self._version = version
+
+    def get_many(self, keys, version):
+        """Return {key: result} for the keys that are cached and fresh."""
+        now = time.time()
+        found = {}
+        with self._lock:
+            self._check_version(version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if now - entry[0] > self.ttl:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = dict(entry[1])
+
+        missing = [key for key in keys if key not in found]
+        if missing and self._persist_enabled():
+            stored = self._load_persisted(missing, now)
+            with self._lock:
+                for key, (created, result) in stored.items():
+                    self._store(key, result, created)
+                self.persistent_hits += len(stored)
+            found.update({key: dict(result) for key, (_, result) in stored.items()})
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key, version):
+        return self.get_many([key], version).get(key)
+
+    def put_many(self, items, version):
+        """Cache {key: result} computed against snapshot `version`."""
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            for key, result in items.items():
+                self._store(key, result, now)
+        if self._persist_enabled():
+            for key, result in items.items():
+                write_queue.submit(
+                    'INSERT OR REPLACE INTO prediction_cache (key, version, label, prob, model, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, version, result['label'], result['probability'], result['model'], now))
+            # Reads skip expired rows, but under one model version nothing
+            # else would ever delete them
+            if now - self._last_purge >= self.PURGE_INTERVAL:
+                self._last_purge = now
+                write_queue.submit('DELETE FROM prediction_cache WHERE created_at <= ?', (now - self.ttl,))
+
+    def put(self, key, result, version):
+        self.put_many({key: result}, version)
+
+    def _store(self, key, result, created):
+        self._entries[key] = (created, dict(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load_persisted(self, keys, now):
+        stored = {}
+        try:
+            conn = get_db_connection()
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, label, prob, model, created_at FROM prediction_cache "
+                    f"WHERE key IN ({', '.join('?' for _ in chunk)}) AND created_at > ?",
+                    (*chunk, now - self.ttl)).fetchall()
+                for row in rows:
+                    result = {'label': row['label'], 'probability': row['prob'], 'model': row['model']}
+                    stored[row['key']] = (row['created_at'], result)
+            conn.close()
+        except sqlite3.Error:
+            # The persistent tier is best effort (e.g. table not created yet)
+            return {}
+        return stored
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'persistent_hits': self.persistent_hits,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+prediction_cache = PredictionCache()
+telemetry.register_collector('prediction_cache', prediction_cache.stats)
@@ -0,0 +1,131 @@
+"""Compact serving models: smaller vocabularies, smaller forests, a distilled Ensemble.
+
+train_compact() fits every configuration in COMPACT_CONFIGS off one
+load/vectorize pass and records each one's accuracy together with what it
+costs to serve (input features, pickled size, single-request latency; see
+ml.train.serving_cost) in the models table, so a serving model can be
+chosen on cost as well as accuracy.
+
+Vocabulary selection is chi2 (the COMPACT_VOCABULARY best terms) or L1 (the
+terms an L1-penalised linear SVM gives a non-zero weight). The vectorizer is
+then refitted on only those terms, so the served vocabulary shrinks too.
+"""
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import chi2
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.svm import LinearSVC
+from config import Config
+from ml.features import build_vectorizer, fit_vectorize, prune_vocabulary, text_vectorizer, vectorize
+from ml.registry import registry
+from ml.store import model_store
+from ml.train import build_model, evaluate, load_and_preprocess, serving_cost
+from utils.metrics import log_training, save_model_metrics_batch
+
+COMPACT_ALGORITHM = 'Compact'
+
+# Published model name -> (vocabulary selection, model)
+COMPACT_CONFIGS = {
+    'Compact LR chi2': ('chi2', 'Logistic Regression'),
+    'Compact LR L1': ('l1', 'Logistic Regression'),
+    'Compact Random Forest': ('chi2', 'Random Forest'),
+    'Distilled Ensemble': ('chi2', 'Ensemble'),
+}
+
+def select_terms(method, X, y, n_terms):
+    """Indices of the text columns (the first n_terms of X) to keep."""
+    if method == 'chi2':
+        scores, _ = chi2(X[:, :n_terms], y)
+        return np.argsort(-np.nan_to_num(scores))[:min(Config.COMPACT_VOCABULARY, n_terms)]
+    if method == 'l1':
+        svm = LinearSVC(penalty='l1', dual=False, C=Config.COMPACT_L1_C).fit(X, y)
+        return np.flatnonzero(np.abs(svm.coef_[:, :n_terms]).max(axis=0) > 0)
+    raise ValueError(f"Unknown feature selection: {method}")
+
+def distill(teacher, X_teacher, X_student):
+    """Logistic Regression trained on `teacher`'s class probabilities.
+
+    Each training row appears once per class, weighted by the teacher's
+    probability for that class, which fits the student to the soft labels.
+    """
+    proba = teacher.predict_proba(X_teacher)
+    n, k = proba.shape
+    student = LogisticRegression(max_iter=1000)
+    student.fit(sp.vstack([X_student] * k, format='csr'), np.repeat(teacher.classes_, n),
+                sample_weight=proba.T.ravel())
+    return student
+
+def train_compact(dataset_path, configs=None, progress=None):
+    """Train and publish the compact models; returns {name: metrics and serving cost}."""
+    report = progress or (lambda fraction, message: None)
+    names = list(configs or COMPACT_CONFIGS)
+    for name in names:
+        if name not in COMPACT_CONFIGS:
+            raise ValueError(f"Unknown compact configuration: {name}")
+    log_training(COMPACT_ALGORITHM, f"Started training: {', '.join(names)}")
+
+    X, y, metadata = load_and_preprocess(dataset_path)
+    texts, y = X.to_numpy(dtype=object), y.to_numpy()
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    meta_train = metadata.iloc[train_idx] if metadata is not None else None
+    meta_test = metadata.iloc[test_idx] if metadata is not None else None
+
+    full = build_vectorizer(TfidfVectorizer(max_features=Config.TFIDF_MAX_FEATURES), metadata)
+    X_full = fit_vectorize(full, texts[train_idx], meta_train)
+    n_terms = len(text_vectorizer(full).vocabulary_)
+    report(0.2, "Text vectorized")
+
+    selected = {}
+    def features(method):
+        # (pruned vectorizer, X_train, X_test), computed once per selection method
+        if method not in selected:
+            vectorizer = prune_vocabulary(full, select_terms(method, X_full, y[train_idx], n_terms))
+            X_train = fit_vectorize(vectorizer, texts[train_idx], meta_train)
+            selected[method] = (vectorizer, X_train, vectorize(vectorizer, texts[test_idx], meta_test))
+        return selected[method]
+
+    fitted, results = {}, {}
+    for i, name in enumerate(names):
+        report(0.2 + 0.6 * i / len(names), f"Fitting {name}")
+        method, algo_name = COMPACT_CONFIGS[name]
+        try:
+            vectorizer, X_train, X_test = features(method)
+            if algo_name == 'Ensemble':
+                # The full-vocabulary Ensemble is only the teacher; it is not published
+                teacher = build_model('Ensemble').fit(X_full, y[train_idx])
+                model = distill(teacher, X_full, X_train)
+            else:
+                model = build_model(algo_name)
+                if algo_name == 'Random Forest':
+                    model.set_params(n_estimators=Config.COMPACT_TREES, max_depth=Config.COMPACT_MAX_DEPTH, n_jobs=-1)
+                model.fit(X_train, y[train_idx])
+        except Exception as e:
+            log_training(name, f"Training failed: {e}")
+            results[name] = {'error': str(e)}
+            continue
+        fitted[name] = (vectorizer, model)
+        results[name] = evaluate(model, X_test, y[test_idx])
+        results[name].update(serving_cost(vectorizer, model, texts[test_idx]))
+    if not fitted:
+        return results
+
+    report(0.9, "Publishing")
+    with model_store.stage() as bundle:
+        rows = [(name, results[name]['accuracy'], results[name]['f1'], results[name]['precision'],
+                 results[name]['recall'], results[name]) for name in fitted]
+        metrics_ids = save_model_metrics_batch(rows, bundle=bundle.name)
+        vectorizer_files = {}
+        for (name, (vectorizer, model)), metrics_id in zip(fitted.items(), metrics_ids):
+            if id(vectorizer) not in vectorizer_files:
+                vectorizer_files[id(vectorizer)] = bundle.add_vectorizer(vectorizer)
+            bundle.add_model(name, model, vectorizer_files[id(vectorizer)], metrics_id)
+        bundle.publish()
+    registry.invalidate()
+
+    for name in fitted:
+        r = results[name]
+        log_training(name, f"Training completed. Accuracy: {r['accuracy']:.4f}, {r['n_features']} features, "
+                           f"{r['size_bytes'] / 1e6:.2f} MB, {r['latency_ms']:.2f} ms/request")
+    return results
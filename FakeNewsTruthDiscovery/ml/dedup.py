@@ -0,0 +1,230 @@
+"""Near-duplicate index over checked articles and training rows (MinHash + LSH).
+
+Every stored prediction and every dataofdatasets row gets a MinHash
+signature of its word 3-gram shingles: NUM_PERM minimums of a
+multiply-shift hash family, whose agreement rate estimates the Jaccard
+similarity of two texts. The signature is cut into BANDS bands of ROWS
+values; texts sharing any band hash land in the same bucket. A lookup only
+reads the buckets of its own BANDS band hashes (one indexed query), then
+scores those candidates on the full signatures, so its cost does not grow
+with the number of indexed texts. With 20 bands of 5 rows a pair at
+Jaccard 0.8 becomes a candidate with probability 0.9996, at 0.5 with 0.47.
+
+Signatures and buckets live in SQLite (minhash_signatures, minhash_buckets),
+so the index survives restarts. New predictions and training rows are
+folded in by catch_up(), which resumes from per-source watermarks; the app
+runs it in a background thread at most every DEDUP_REFRESH_INTERVAL
+seconds, and `python -m ml.dedup build` indexes a backlog in one go.
+
+    python -m ml.dedup build
+    python -m ml.dedup query "text of an article"
+"""
+import argparse
+import threading
+import time
+import zlib
+import numpy as np
+from config import Config
+from ml.preprocess import clean_text
+from utils.db import get_db_connection
+
+NEAR_DUPLICATE_INDEX = 'Near-duplicate index'
+
+SHINGLE_WORDS = 3
+BANDS = 20
+ROWS = 5
+NUM_PERM = BANDS * ROWS
+# Candidates (by number of shared bands) scored on the full signature
+MAX_CANDIDATES = 50
+
+# h(x) = (a * x + b) mod 2^64 >> 32, one (a, b) pair per permutation
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+# Combines a band's ROWS values (and the band number) into one 64-bit bucket key
+_BAND_MIX = _rng.integers(1, 2 ** 63, ROWS + 1, dtype=np.uint64) | np.uint64(1)
+
+# source -> query for (id, text, label, prob) rows after a watermark
+SOURCES = {
+    'predictions': ("SELECT id, text, predicted_label, prob FROM predictions_with_text "
+                    "WHERE id > ? AND predicted_label != 'Error' ORDER BY id LIMIT ?"),
+    'dataofdatasets': 'SELECT id, text, label, NULL FROM dataofdatasets WHERE id > ? ORDER BY id LIMIT ?',
+}
+
+
+def shingles(cleaned):
+    """crc32 of every run of SHINGLE_WORDS words (the whole text if it is shorter)."""
+    words = cleaned.split()
+    if len(words) <= SHINGLE_WORDS:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter({zlib.crc32(g.encode('utf-8')) for g in grams}, dtype=np.uint64)
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM uint32) of a raw text; None if it has no words."""
+    x = shingles(clean_text(text))
+    if not len(x):
+        return None
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def bucket_keys(sig):
+    """One signed 64-bit bucket key per band, as SQLite stores integers."""
+    bands = sig.astype(np.uint64).reshape(BANDS, ROWS)
+    keys = (bands * _BAND_MIX[:ROWS]).sum(axis=1) + np.arange(BANDS, dtype=np.uint64) * _BAND_MIX[ROWS]
+    return keys.view(np.int64).tolist()
+
+
+def similarity(sig_a, sig_b):
+    # Share of agreeing permutations: an unbiased estimate of the Jaccard similarity
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = Config.DEDUP_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self._last_catch_up = 0.0
+        self._lock = threading.Lock()
+
+    # --- Indexing -------------------------------------------------------
+
+    def _watermarks(self, conn):
+        rows = conn.execute('SELECT source, last_id FROM training_watermarks WHERE model = ?',
+                            (NEAR_DUPLICATE_INDEX,)).fetchall()
+        marks = {source: 0 for source in SOURCES}
+        marks.update({row['source']: row['last_id'] for row in rows})
+        return marks
+
+    def catch_up(self, chunk_size=None):
+        """Index rows added since the last call; returns {source: rows indexed}."""
+        chunk_size = chunk_size or Config.DEDUP_BATCH_SIZE
+        conn = get_db_connection()
+        indexed = {}
+        try:
+            for source, last_id in self._watermarks(conn).items():
+                indexed[source] = 0
+                while True:
+                    rows = conn.execute(SOURCES[source], (last_id, chunk_size)).fetchall()
+                    if not rows:
+                        break
+                    self._add(conn, source, rows)
+                    last_id = rows[-1][0]
+                    indexed[source] += len(rows)
+        finally:
+            conn.close()
+        self._last_catch_up = time.monotonic()
+        return indexed
+
+    def _add(self, conn, source, rows):
+        # Signatures are computed before the write lock is taken, and each
+        # small chunk commits with its watermark, so live writers (the
+        # write-behind queue) only ever wait for one short transaction.
+        signed = []
+        for source_id, text, label, prob in rows:
+            sig = signature(text)
+            if sig is not None:
+                signed.append((source_id, label, prob, sig.tobytes(), bucket_keys(sig)))
+        with conn:
+            for source_id, label, prob, sig_bytes, keys in signed:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO minhash_signatures (source, source_id, label, prob, signature) '
+                    'VALUES (?, ?, ?, ?, ?)', (source, source_id, label, prob, sig_bytes))
+                if cursor.rowcount:
+                    doc_id = cursor.lastrowid
+                    conn.executemany('INSERT OR IGNORE INTO minhash_buckets (bucket, doc_id) VALUES (?, ?)',
+                                     [(key, doc_id) for key in keys])
+            conn.execute('INSERT OR REPLACE INTO training_watermarks (model, source, last_id) VALUES (?, ?, ?)',
+                         (NEAR_DUPLICATE_INDEX, source, rows[-1][0]))
+
+    def _catch_up_in_background(self):
+        try:
+            self.catch_up()
+        except Exception as e:
+            print(f'Near-duplicate index update failed: {e}')
+        finally:
+            self._lock.release()
+
+    def maybe_catch_up(self):
+        """Start a background catch_up() if the last one is older than the refresh interval."""
+        if time.monotonic() - self._last_catch_up >= self.refresh_interval and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._catch_up_in_background, name='near-duplicate-index', daemon=True).start()
+
+    # --- Lookup ---------------------------------------------------------
+
+    def lookup(self, text, threshold=None):
+        """The most similar indexed text at or above `threshold`, or None.
+
+        Returns {similarity, label, probability, confirmed, source, source_id,
+        snippet}. For an earlier prediction the label is the one an admin
+        confirmed, if any. Ties go to training rows, then to the newest.
+        """
+        threshold = Config.DEDUP_THRESHOLD if threshold is None else threshold
+        sig = signature(text)
+        if sig is None:
+            return None
+        keys = bucket_keys(sig)
+        conn = get_db_connection()
+        try:
+            candidates = conn.execute(f'''
+                SELECT s.id, s.source, s.source_id, s.label, s.prob, s.signature FROM minhash_signatures s
+                JOIN (SELECT doc_id, COUNT(*) AS shared FROM minhash_buckets
+                      WHERE bucket IN ({', '.join('?' * len(keys))})
+                      GROUP BY doc_id ORDER BY shared DESC, doc_id DESC LIMIT ?) c ON c.doc_id = s.id
+            ''', keys + [MAX_CANDIDATES]).fetchall()
+
+            best, best_rank = None, None
+            for row in candidates:
+                score = similarity(sig, np.frombuffer(row['signature'], dtype=np.uint32))
+                if score < threshold:
+                    continue
+                # Ground truth (a training row) beats a model's earlier verdict
+                rank = (score, row['source'] == 'dataofdatasets', row['id'])
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = row, rank
+            if best is None:
+                return None
+
+            label, confirmed = best['label'], best['source'] == 'dataofdatasets'
+            if best['source'] == 'predictions':
+                snippet = conn.execute('SELECT substr(text, 1, 120) FROM predictions_with_text WHERE id = ?',
+                                       (best['source_id'],)).fetchone()
+                feedback = conn.execute('SELECT label FROM feedback WHERE prediction_id = ? ORDER BY id DESC LIMIT 1',
+                                        (best['source_id'],)).fetchone()
+                if feedback:
+                    label, confirmed = feedback['label'], True
+            else:
+                snippet = conn.execute('SELECT substr(text, 1, 120) FROM dataofdatasets WHERE id = ?',
+                                       (best['source_id'],)).fetchone()
+        finally:
+            conn.close()
+        return {'similarity': best_rank[0], 'label': label, 'probability': best['prob'], 'confirmed': confirmed,
+                'source': best['source'], 'source_id': best['source_id'],
+                'snippet': snippet[0] if snippet else None}
+
+
+near_duplicates = NearDuplicateIndex()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the near-duplicate index.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build')
+    query = sub.add_parser('query')
+    query.add_argument('text')
+    query.add_argument('--threshold', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        indexed = near_duplicates.catch_up()
+        print(f"Indexed {', '.join(f'{n} {source}' for source, n in indexed.items())} "
+              f"in {time.perf_counter() - start:.1f} s")
+    else:
+        print(near_duplicates.lookup(args.text, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Compiled scorer for linear models: TF-IDF + dot product in plain NumPy.
+
+For Logistic Regression (and a linear SVM wrapped in CalibratedClassifierCV)
+scoring a document is a sparse dot product between its TF-IDF row and the
+coefficient matrix. CompiledLinearScorer extracts the fitted vocabulary, idf
+weights, coefficients and calibrators once and then tokenizes, weights, L2
+normalises and scores without going through sklearn's transform/predict_proba
+stack and its input validation. The standardised metadata columns of a
+TextMetadataVectorizer (ml/features.py) are linear too: their coefficients
+are applied to the scaled values next to the TF-IDF part.
+
+Enable it for serving with SERVING_ENGINE=compiled. Models it cannot compile
+(forests, ensembles, non-default vectorizer settings) keep using sklearn;
+each fallback is logged and counted as compile_fallbacks.
+"""
+import re
+import sys
+import threading
+import numpy as np
+import scipy.sparse as sp
+from utils.telemetry import telemetry
+
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+# Probabilities must match sklearn's within this tolerance or compile() refuses
+TOLERANCE = 1e-8
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+def _expit(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def probe_texts(vocabulary, count=20, seed=0):
+    """Documents made of vocabulary terms, repeats and unknown words for parity checks."""
+    terms = sorted(vocabulary)
+    if not terms:
+        return []
+    rng = np.random.default_rng(seed)
+    docs = ['', 'zzzunknownzzz']
+    for _ in range(count):
+        words = list(rng.choice(terms, size=min(len(terms), int(rng.integers(1, 60)))))
+        docs.append(' '.join(words + words[:3] + ['zzzunknownzzz']))
+    return docs
+
+
+def probe_metadata(columns, count, seed=0):
+    """Metadata rows to pair with probe_texts: none, partial and complete ones."""
+    from utils.ingest import SENTIMENT_SCORES
+    rng = np.random.default_rng(seed)
+    rows = [None]
+    for _ in range(count - 1):
+        row = {}
+        for col in columns:
+            if rng.random() < 0.2:
+                continue
+            if col == 'sentiment':
+                row[col] = str(rng.choice(sorted(SENTIMENT_SCORES)))
+            elif col == 'author_verified':
+                row[col] = int(rng.integers(0, 2))
+            else:
+                row[col] = float(rng.uniform(0, 10000))
+        rows.append(row)
+    return rows
+
+
+class CompiledLinearScorer:
+    """Linear text classifier scored directly from extracted arrays.
+
+    `heads` is a list of (coef, intercept, calibration) tuples whose
+    probabilities are averaged: one head for Logistic Regression, one per CV
+    fold for a calibrated linear SVM. `calibration` is None (logistic/softmax
+    link) or (method, per-class calibrator params) as in CalibratedClassifierCV.
+    `metadata` is None or the (columns, mean, scale) of a TextMetadataVectorizer,
+    whose coefficients follow the TF-IDF ones in every head.
+    """
+
+    def __init__(self, vocabulary, idf, classes, heads, token_pattern=DEFAULT_TOKEN_PATTERN, metadata=None):
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.heads = heads
+        self.metadata = metadata
+        self._token_re = re.compile(token_pattern)
+
+    # --- Building -------------------------------------------------------
+
+    @classmethod
+    def compile(cls, vectorizer, model, check_texts=None):
+        """Build a scorer from a fitted TfidfVectorizer (optionally with metadata) and linear model.
+
+        Raises ValueError for configurations the fast path does not reproduce
+        or when its probabilities on `check_texts` (by default probe documents
+        built from the vocabulary, with probe metadata) differ from sklearn's.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from ml.features import uses_metadata, vectorize
+        text, metadata = vectorizer, None
+        if uses_metadata(vectorizer):
+            text = vectorizer.text_vectorizer
+            metadata = (list(vectorizer.columns), np.asarray(vectorizer.mean_, dtype=np.float64),
+                        np.asarray(vectorizer.scale_, dtype=np.float64))
+        if type(text) is not TfidfVectorizer:
+            raise ValueError('Only TfidfVectorizer is supported')
+        supported = (text.analyzer == 'word' and text.ngram_range == (1, 1)
+                     and text.lowercase and text.strip_accents is None
+                     and text.preprocessor is None and text.tokenizer is None
+                     and text.stop_words is None and not text.binary
+                     and text.use_idf and not text.sublinear_tf and text.norm == 'l2')
+        if not supported:
+            raise ValueError('Vectorizer settings are not supported by the fast path')
+
+        scorer = cls(dict(text.vocabulary_), text.idf_, model.classes_,
+                     cls._extract_heads(model), text.token_pattern, metadata)
+        if check_texts is None:
+            check_texts = probe_texts(text.vocabulary_)
+        if check_texts:
+            check_metadata = probe_metadata(metadata[0], len(check_texts)) if metadata else None
+            expected = model.predict_proba(vectorize(vectorizer, check_texts, check_metadata))
+            diff = np.abs(scorer.predict_proba(check_texts, check_metadata) - expected).max()
+            if diff > TOLERANCE:
+                raise ValueError(f'Compiled scorer differs from sklearn by {diff:.2e}')
+        return scorer
+
+    @staticmethod
+    def _extract_heads(model):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.calibration import CalibratedClassifierCV
+
+        if type(model) is LogisticRegression:
+            return [(np.asarray(model.coef_, dtype=np.float64),
+                     np.asarray(model.intercept_, dtype=np.float64), None)]
+
+        if type(model) is CalibratedClassifierCV:
+            heads = []
+            for calibrated in model.calibrated_classifiers_:
+                estimator = calibrated.estimator
+                if not hasattr(estimator, 'coef_') or calibrated.method not in ('sigmoid', 'isotonic'):
+                    raise ValueError('Only linear estimators with sigmoid/isotonic calibration are supported')
+                if not np.array_equal(estimator.classes_, model.classes_):
+                    raise ValueError('Every calibration fold must have seen all classes')
+                if calibrated.method == 'sigmoid':
+                    params = [(c.a_, c.b_) for c in calibrated.calibrators]
+                else:
+                    params = [(c.X_min_, c.X_max_, c.X_thresholds_, c.y_thresholds_) for c in calibrated.calibrators]
+                heads.append((np.asarray(estimator.coef_, dtype=np.float64),
+                              np.asarray(estimator.intercept_, dtype=np.float64),
+                              (calibrated.method, params)))
+            return heads
+
+        raise ValueError(f'{type(model).__name__} is not a supported linear model')
+
+    # --- Scoring --------------------------------------------------------
+
+    def transform(self, texts):
+        """TF-IDF rows (L2-normalised CSR) for already cleaned texts."""
+        vocabulary = self.vocabulary
+        findall = self._token_re.findall
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            row = {}
+            for token in findall(text.lower()):
+                j = vocabulary.get(token)
+                if j is not None:
+                    row[j] = row.get(j, 0) + 1
+            indices.extend(row)
+            counts.extend(row.values())
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.int32)
+        lengths = np.diff(indptr)
+        data = np.asarray(counts, dtype=np.float64) * self.idf[indices]
+        # L2-normalise each row; empty rows stay all-zero
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(lengths)))
+        norms[norms == 0] = 1.0
+        data /= norms[rows]
+        return sp.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int32)),
+                             shape=(len(lengths), len(self.idf)))
+
+    def metadata_features(self, metadata, n_rows):
+        """Standardised metadata columns, or None when every value would be 0."""
+        if self.metadata is None or metadata is None or not any(metadata):
+            # Missing metadata is imputed with the training mean, i.e. 0
+            return None
+        from ml.features import metadata_frame, metadata_values
+        columns, mean, scale = self.metadata
+        values = (metadata_values(metadata_frame(metadata, n_rows), columns) - mean) / scale
+        values[np.isnan(values)] = 0.0
+        return values
+
+    def _head_proba(self, X, M, coef, intercept, calibration):
+        n_text = X.shape[1]
+        scores = np.asarray(X @ coef[:, :n_text].T) + intercept
+        if M is not None:
+            scores += M @ coef[:, n_text:].T
+        n_classes = len(self.classes_)
+
+        if calibration is None:
+            if n_classes == 2:
+                p = _expit(scores[:, 0])
+                return np.column_stack([1.0 - p, p])
+            return _softmax(scores)
+
+        method, params = calibration
+        proba = np.zeros((X.shape[0], n_classes))
+        columns = [1] if n_classes == 2 else range(n_classes)
+        for class_idx, column, param in zip(columns, scores.T, params):
+            if method == 'sigmoid':
+                a, b = param
+                proba[:, class_idx] = _expit(-(a * column + b))
+            else:
+                x_min, x_max, xs, ys = param
+                proba[:, class_idx] = np.interp(np.clip(column, x_min, x_max), xs, ys)
+        if n_classes == 2:
+            proba[:, 0] = 1.0 - proba[:, 1]
+        else:
+            denominator = proba.sum(axis=1, keepdims=True)
+            uniform = np.full_like(proba, 1.0 / n_classes)
+            proba = np.divide(proba, denominator, out=uniform, where=denominator != 0)
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
+
+    def predict_proba(self, texts, metadata=None):
+        """Class probabilities for cleaned texts and their metadata dicts (or None)."""
+        X = self.transform(texts)
+        M = self.metadata_features(metadata, X.shape[0])
+        proba = self._head_proba(X, M, *self.heads[0])
+        for head in self.heads[1:]:
+            proba += self._head_proba(X, M, *head)
+        if len(self.heads) > 1:
+            proba /= len(self.heads)
+        return proba
+
+    def predict(self, texts, metadata=None):
+        return self.classes_[np.argmax(self.predict_proba(texts, metadata), axis=1)]
+
+
+_compile_lock = threading.Lock()
+
+
+def compiled_for(snapshot, model_file, vectorizer, model):
+    """The snapshot's compiled scorer for `model_file`, or None if not compilable.
+
+    Compiled once per snapshot, so a reload recompiles against the new files.
+    """
+    compiled = snapshot.compiled
+    if model_file not in compiled:
+        with _compile_lock:
+            if model_file not in compiled:
+                try:
+                    compiled[model_file] = CompiledLinearScorer.compile(vectorizer, model)
+                except (ValueError, AttributeError) as e:
+                    print(f'{model_file} is served by sklearn, not compiled: {e}', file=sys.stderr)
+                    telemetry.count('compile_fallbacks')
+                    compiled[model_file] = None
+    return compiled[model_file]
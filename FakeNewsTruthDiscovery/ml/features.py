@@ -0,0 +1,143 @@
+"""TF-IDF text features stacked with the scaled post metadata.
+
+dataset.csv and dataofdatasets carry numeric metadata next to each text
+(author followers/verified, retweets, likes, shares, credibility score,
+sentiment). TextMetadataVectorizer appends those as a handful of extra
+columns to the sparse TF-IDF matrix, so every estimator sees both without
+the text features ever being densified.
+"""
+import json
+import numpy as np
+import scipy.sparse as sp
+from config import Config
+from utils.ingest import METADATA_COLUMNS, SENTIMENT_SCORES
+
+# Heavy-tailed counts are log-scaled before standardising
+LOG_COLUMNS = {'author_followers', 'retweets', 'likes', 'shares'}
+
+
+def metadata_frame(metadata, n_rows):
+    """DataFrame of METADATA_COLUMNS from a DataFrame, a list of dicts/None, or None."""
+    # Imported here: serving text-only models never needs pandas
+    import pandas as pd
+    if metadata is None:
+        return pd.DataFrame(index=range(n_rows), columns=METADATA_COLUMNS)
+    if isinstance(metadata, pd.DataFrame):
+        return metadata.reset_index(drop=True).reindex(columns=METADATA_COLUMNS)
+    return pd.DataFrame.from_records([m or {} for m in metadata], columns=METADATA_COLUMNS)
+
+
+def metadata_values(frame, columns):
+    """(n, len(columns)) float array; unparseable or missing fields are NaN."""
+    import pandas as pd
+    values = np.empty((len(frame), len(columns)))
+    for j, col in enumerate(columns):
+        column = frame[col]
+        if col == 'sentiment':
+            column = column.map(lambda v: SENTIMENT_SCORES.get(str(v).strip().lower(), v))
+        column = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        if col in LOG_COLUMNS:
+            column = np.log1p(np.clip(column, 0, None))
+        values[:, j] = column
+    return values
+
+
+def metadata_key(metadata):
+    # Canonical string for one row's metadata; '' when there is none
+    if not metadata:
+        return ''
+    fields = {col: metadata.get(col) for col in METADATA_COLUMNS if metadata.get(col) not in (None, '')}
+    return json.dumps(fields, sort_keys=True, default=str) if fields else ''
+
+
+def _append_columns(X, dense):
+    # CSR in, CSR out: the TF-IDF part is never densified
+    return sp.hstack([X, sp.csr_matrix(dense)], format='csr')
+
+
+class TextMetadataVectorizer:
+    """A fitted text vectorizer plus standardised metadata columns.
+
+    transform(texts, metadata) returns the text features with one extra
+    column per metadata field. Missing fields, or no metadata at all, are
+    imputed with the training mean and so contribute 0.
+    """
+
+    def __init__(self, text_vectorizer, columns):
+        self.text_vectorizer = text_vectorizer
+        self.columns = list(columns)
+
+    def fit_transform(self, texts, metadata=None):
+        X = self.text_vectorizer.fit_transform(texts)
+        values = metadata_values(metadata_frame(metadata, X.shape[0]), self.columns)
+        # build_vectorizer only picks columns with at least one value
+        self.mean_ = np.nanmean(values, axis=0)
+        scale = np.nanstd(values, axis=0)
+        self.scale_ = np.where(scale > 0, scale, 1.0)
+        return _append_columns(X, self._scale(values))
+
+    def fit(self, texts, metadata=None):
+        self.fit_transform(texts, metadata)
+        return self
+
+    def transform(self, texts, metadata=None):
+        X = self.text_vectorizer.transform(texts)
+        return _append_columns(X, self._scale(metadata_values(metadata_frame(metadata, X.shape[0]), self.columns)))
+
+    def _scale(self, values):
+        values = (values - self.mean_) / self.scale_
+        values[np.isnan(values)] = 0.0
+        return values
+
+    def get_feature_names_out(self):
+        return np.concatenate([self.text_vectorizer.get_feature_names_out(),
+                               np.array([f'meta__{col}' for col in self.columns], dtype=object)])
+
+
+def text_vectorizer(vectorizer):
+    return vectorizer.text_vectorizer if uses_metadata(vectorizer) else vectorizer
+
+
+def prune_vocabulary(vectorizer, keep):
+    """Unfitted copy of `vectorizer` restricted to the text columns in `keep`.
+
+    `keep` indexes the columns of the vectorizer's output; metadata columns
+    are always kept. Refitting on the same texts gives the kept terms the
+    same idf as before, and the serving vocabulary shrinks to len(keep).
+    """
+    from sklearn.base import clone
+    text = text_vectorizer(vectorizer)
+    terms = text.get_feature_names_out()
+    keep = sorted(j for j in keep if j < len(terms))
+    pruned = clone(text).set_params(vocabulary=list(terms[keep]), max_features=None)
+    return TextMetadataVectorizer(pruned, vectorizer.columns) if uses_metadata(vectorizer) else pruned
+
+
+def uses_metadata(vectorizer):
+    return isinstance(vectorizer, TextMetadataVectorizer)
+
+
+def vectorize(vectorizer, texts, metadata=None):
+    """vectorizer.transform(texts), passing metadata to vectorizers that use it."""
+    if uses_metadata(vectorizer):
+        return vectorizer.transform(texts, metadata)
+    return vectorizer.transform(texts)
+
+
+def fit_vectorize(vectorizer, texts, metadata=None):
+    """vectorizer.fit_transform(texts), passing metadata to vectorizers that use it."""
+    if uses_metadata(vectorizer):
+        return vectorizer.fit_transform(texts, metadata)
+    return vectorizer.fit_transform(texts)
+
+
+def build_vectorizer(text_vectorizer, metadata=None):
+    """Wrap `text_vectorizer` with the metadata columns `metadata` (a DataFrame) actually has.
+
+    Returns `text_vectorizer` unchanged when metadata features are disabled or
+    the data carries none.
+    """
+    if not Config.METADATA_FEATURES or metadata is None:
+        return text_vectorizer
+    columns = [col for col in METADATA_COLUMNS if col in metadata.columns and metadata[col].notna().any()]
+    return TextMetadataVectorizer(text_vectorizer, columns) if columns else text_vectorizer
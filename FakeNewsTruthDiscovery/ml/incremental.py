@@ -0,0 +1,149 @@
+"""Incremental model refresh from new uploads and admin-confirmed predictions.
+
+The 'Streaming SGD' model is a HashingVectorizer + SGDClassifier pipeline.
+Hashing has no fitted vocabulary, so the model can keep learning with
+partial_fit on new rows without refitting or replacing any vectorizer.
+Each refresh reads only rows added since the previous one (per-source
+watermarks in training_watermarks), scores every chunk before learning
+from it (test-then-train) to produce the metrics for the new version, and
+then publishes the updated pipeline as a new model store bundle.
+"""
+import joblib
+import numpy as np
+from sklearn.metrics import confusion_matrix
+from sklearn.pipeline import Pipeline
+from config import Config
+from ml.preprocess import clean_texts
+from ml.registry import registry
+from ml.store import model_store
+from ml.train import STREAMING_ALGORITHM, metrics_from_confusion, streaming_parts
+from utils.db import get_db_connection
+from utils.metrics import log_training, save_model_metrics
+
+INCREMENTAL_ALGORITHM = 'Incremental Update'
+
+# source name -> query returning (id, text, label) rows after a watermark
+SOURCES = {
+    'dataofdatasets': 'SELECT id, text, label FROM dataofdatasets WHERE id > ? ORDER BY id LIMIT ?',
+    'feedback': ('SELECT f.id, p.text, f.label FROM feedback f '
+                 'JOIN predictions_with_text p ON p.id = f.prediction_id '
+                 'WHERE f.id > ? ORDER BY f.id LIMIT ?'),
+}
+
+def get_watermarks(model_name):
+    conn = get_db_connection()
+    rows = conn.execute('SELECT source, last_id FROM training_watermarks WHERE model = ?', (model_name,)).fetchall()
+    conn.close()
+    marks = {source: 0 for source in SOURCES}
+    marks.update({row['source']: row['last_id'] for row in rows})
+    return marks
+
+def latest_ids():
+    """{source: newest id stored so far}, 0 for an empty source (sources are named after their tables)."""
+    conn = get_db_connection()
+    marks = {source: conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {source}').fetchone()[0] for source in SOURCES}
+    conn.close()
+    return marks
+
+def save_watermarks(model_name, marks):
+    conn = get_db_connection()
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO training_watermarks (model, source, last_id) VALUES (?, ?, ?)',
+                         [(model_name, source, last_id) for source, last_id in marks.items()])
+    conn.close()
+
+def iter_new_rows(source, after_id, chunk_size):
+    """Yield lists of (id, text, label) rows newer than `after_id`, oldest first."""
+    conn = get_db_connection()
+    try:
+        while True:
+            rows = conn.execute(SOURCES[source], (after_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+            after_id = rows[-1][0]
+    finally:
+        conn.close()
+
+def known_labels():
+    conn = get_db_connection()
+    labels = [row[0] for row in conn.execute(
+        'SELECT DISTINCT label FROM dataofdatasets UNION SELECT DISTINCT label FROM feedback') if row[0] is not None]
+    conn.close()
+    return np.array(sorted(set(map(str, labels))))
+
+def load_current(model_name):
+    path = model_store.model_path(model_name)
+    if path is None:
+        return None
+    # No mmap: partial_fit updates the coefficient arrays in place
+    return joblib.load(path)
+
+def update_incremental(model_name=STREAMING_ALGORITHM, progress=None, chunk_size=None):
+    """Fold rows added since the last refresh into the online model and publish it.
+
+    Returns the prequential metrics of the new version plus 'rows'. With
+    nothing new it returns {'rows': 0} and publishes nothing.
+    """
+    report = progress or (lambda fraction, message: None)
+    chunk_size = chunk_size or Config.INGEST_CHUNK_SIZE
+
+    pipeline = load_current(model_name)
+    if pipeline is None:
+        vectorizer, model = streaming_parts()
+        pipeline = Pipeline([('vectorizer', vectorizer), ('clf', model)])
+        classes = known_labels()
+        fitted = False
+    else:
+        vectorizer, model = pipeline.named_steps['vectorizer'], pipeline.named_steps['clf']
+        classes = model.classes_
+        fitted = True
+    if not len(classes):
+        raise ValueError('No labelled rows to learn from. Upload a dataset first.')
+
+    log_training(model_name, "Started incremental update...")
+    marks = get_watermarks(model_name)
+    class_index = {label: i for i, label in enumerate(classes)}
+    cm = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    used = 0
+
+    for source in SOURCES:
+        for rows in iter_new_rows(source, marks[source], chunk_size):
+            marks[source] = rows[-1][0]
+            # The classifier's classes are fixed once trained; rows with an
+            # unseen label need a full retrain and are skipped here.
+            rows = [(text, str(label)) for _, text, label in rows if str(label) in class_index]
+            if not rows:
+                continue
+            texts, labels = zip(*rows)
+            X = vectorizer.transform(clean_texts(texts))
+            if fitted:
+                cm += confusion_matrix(labels, model.predict(X), labels=classes)
+            model.partial_fit(X, list(labels), classes=classes)
+            fitted = True
+            used += len(rows)
+            report(0.5, f"Learned from {used} new rows")
+
+    if used == 0:
+        save_watermarks(model_name, marks)
+        log_training(model_name, "Incremental update: no new labelled rows.")
+        return {'rows': 0}
+
+    metrics = metrics_from_confusion(cm) if cm.sum() else None
+    with model_store.stage() as bundle:
+        metrics_id = None
+        if metrics is not None:
+            metrics_id = save_model_metrics(model_name, metrics['accuracy'], metrics['f1'], metrics['precision'],
+                                            metrics['recall'], bundle=bundle.name)
+        bundle.add_model(model_name, pipeline, metrics_id=metrics_id)
+        bundle.publish()
+    save_watermarks(model_name, marks)
+    registry.invalidate()
+
+    if metrics is None:
+        # Bootstrapped from a single chunk: nothing was scored before learning
+        log_training(model_name, f"Incremental update on {used} rows (new model, not yet evaluated).")
+        return {'rows': used}
+    log_training(model_name, f"Incremental update on {used} rows. Prequential accuracy: {metrics['accuracy']:.4f}")
+    metrics['rows'] = used
+    return metrics
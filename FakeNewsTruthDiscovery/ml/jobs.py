@@ -0,0 +1,84 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from utils.db import write_queue
+from utils.tasks import create_task, update_task
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor(reset=False):
+    global _executor
+    with _executor_lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None:
+            # spawn: the web process has live threads (micro-batcher), which
+            # makes fork unsafe.
+            _executor = ProcessPoolExecutor(max_workers=Config.TRAINING_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def run_training_job(task_id, dataset_path, algo_name):
+    """Runs in a pool process: trains and records status/progress/timing in `tasks`."""
+    from ml.train import train_algorithm, train_all, train_streaming, STREAMING_ALGORITHM
+    from ml.incremental import update_incremental, INCREMENTAL_ALGORITHM
+    from ml.compact import train_compact, COMPACT_ALGORITHM
+    from ml.tuning import train_tuned, TUNING_ALGORITHM
+
+    update_task(task_id, status='running', progress=0.0, start=True)
+
+    def progress(fraction, message):
+        update_task(task_id, progress=fraction, message=message)
+
+    try:
+        if algo_name == 'All':
+            metrics = train_all(dataset_path, progress=progress)
+        elif algo_name == STREAMING_ALGORITHM:
+            metrics = train_streaming(dataset_path, progress=progress)
+        elif algo_name == INCREMENTAL_ALGORITHM:
+            metrics = update_incremental(progress=progress)
+        elif algo_name == COMPACT_ALGORITHM:
+            metrics = train_compact(dataset_path, progress=progress)
+        elif algo_name == TUNING_ALGORITHM:
+            metrics = train_tuned(dataset_path, progress=progress)
+        else:
+            metrics = train_algorithm(dataset_path, algo_name, progress=progress)
+    except Exception as e:
+        update_task(task_id, status='failed', message=str(e), end=True)
+        return None
+    finally:
+        # Pool processes exit without running atexit hooks; push queued logs now
+        write_queue.flush()
+
+    update_task(task_id, status='completed', progress=1.0, message='Training completed',
+                result=metrics, end=True)
+    return metrics
+
+def _job_done(task_id, future):
+    # A pool process that died (OOM kill, crash) never updates its own row
+    error = future.exception()
+    if error is not None:
+        update_task(task_id, status='failed', message=f'Worker process died: {error}', end=True)
+    else:
+        # A finished job may have published a bundle from its own process;
+        # serve it here now rather than at the next periodic check
+        from ml.registry import registry
+        registry.invalidate()
+
+def submit_training(dataset_path, algo_name):
+    """Queue a training run in the process pool and return its task id immediately."""
+    task_id = create_task(f'Train {algo_name}')
+    try:
+        try:
+            future = get_executor().submit(run_training_job, task_id, dataset_path, algo_name)
+        except BrokenProcessPool:
+            future = get_executor(reset=True).submit(run_training_job, task_id, dataset_path, algo_name)
+    except Exception as e:
+        update_task(task_id, status='failed', message=f'Could not start job: {e}', end=True)
+        raise
+    future.add_done_callback(lambda f: _job_done(task_id, f))
+    return task_id
@@ -1,59 +1,102 @@
-import joblib
-import os
-import re
 from config import Config
+from ml.preprocess import clean_text, clean_texts
+from ml.registry import registry
+from ml.cache import prediction_cache
+from ml.fastpath import compiled_for
+from ml.features import metadata_key, uses_metadata, vectorize
+from utils.telemetry import telemetry
 import numpy as np
 
-VECTORIZER_PATH = os.path.join(Config.MODELS_FOLDER, 'vectorizer.pkl')
-
-def clean_text(text):
-    text = str(text).lower()
-    text = re.sub(r'\W', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text
-
-def predict_text(text, algo_name=None):
-    if not os.path.exists(VECTORIZER_PATH):
-        return {'label': 'Error', 'probability': 0.0, 'message': 'Vectorizer not found. Train a model first.'}
-    
-    vectorizer = joblib.load(VECTORIZER_PATH)
-    processed_text = clean_text(text)
-    vec_text = vectorizer.transform([processed_text])
-    
-    # Load model (Default to Random Forest or best performing? Layout says "User can test data")
-    # Usually we pick the best model or a specific one. 
-    # I'll default to 'Ensemble' if exists, else 'Random_Forest', else first found.
-    
-    model_file = None
-    if algo_name:
-        model_file = f"{algo_name.replace(' ', '_')}.pkl"
-    else:
-        # Check priority
-        for name in ['Ensemble.pkl', 'Random_Forest.pkl', 'Logistic_Regression.pkl']:
-            if os.path.exists(os.path.join(Config.MODELS_FOLDER, name)):
-                model_file = name
-                break
-    
-    if not model_file:
-         # Check dynamic list
-         files = os.listdir(Config.MODELS_FOLDER)
-         models = [f for f in files if f.endswith('.pkl') and f != 'vectorizer.pkl']
-         if models:
-             model_file = models[0]
-         else:
-             return {'label': 'Error', 'probability': 0.0, 'message': 'No trained models found.'}
-             
-    model = joblib.load(os.path.join(Config.MODELS_FOLDER, model_file))
-    
-    prediction = model.predict(vec_text)[0]
+def predict_text(text, algo_name=None, metadata=None):
+    # Vectorizers and models stay resident in the registry; it reloads them
+    # only when a new model bundle is published (ml/store.py).
+    # `metadata`: optional dict of post metadata (see ml/features.py)
     try:
-        proba = model.predict_proba(vec_text)[0]
-        max_proba = float(np.max(proba))
-    except:
-        max_proba = 1.0 # SVM without probability=True might fail, or others
-        
-    return {
-        'label': str(prediction),
-        'probability': max_proba,
-        'model': model_file
-    }
+        with telemetry.timer('clean'):
+            cleaned = clean_text(text)
+        return _predict_cleaned([cleaned], algo_name, [metadata])[0]
+    except LookupError as e:
+        return {'label': 'Error', 'probability': 0.0, 'message': str(e)}
+
+def _score(model, X, *args):
+    """Labels and max class probability for every row of X in one predict_proba pass.
+
+    `args` go to predict_proba after X (the compiled scorer takes metadata).
+    """
+    if not hasattr(model, 'predict_proba'):
+        # No probability support (e.g. LinearSVC): fall back to hard predictions
+        return model.predict(X), np.ones(len(X) if isinstance(X, list) else X.shape[0])
+    proba = model.predict_proba(X, *args)
+    idx = np.argmax(proba, axis=1)
+    return model.classes_[idx], proba[np.arange(len(idx)), idx]
+
+def _predict_cleaned(cleaned, algo_name=None, metadata=None):
+    with telemetry.timer('predict'):
+        results = _predict_with_cache(cleaned, algo_name, metadata)
+    telemetry.count('predictions', len(cleaned))
+    return results
+
+def _predict_with_cache(cleaned, algo_name=None, metadata=None):
+    # Serve what we can from the prediction cache, then score each distinct
+    # remaining (text, metadata) once with a single transform/predict_proba call.
+    snap = registry.snapshot(algo_name)
+    vectorizer, model, model_file = snap.resolve(algo_name)
+
+    if metadata is None or not uses_metadata(vectorizer):
+        metadata = [None] * len(cleaned)
+    # Inputs are identified by their text plus metadata (if the model uses any)
+    ids, inputs = [], {}
+    for text, meta in zip(cleaned, metadata):
+        meta_key = metadata_key(meta)
+        input_id = f'{text}\x1f{meta_key}' if meta_key else text
+        ids.append(input_id)
+        inputs.setdefault(input_id, (text, meta))
+
+    results = {}
+    if Config.PREDICTION_CACHE_ENABLED:
+        keys = {input_id: prediction_cache.key(input_id, model_file, snap.version) for input_id in inputs}
+        cached = prediction_cache.get_many(list(set(keys.values())), snap.version)
+        results = {input_id: cached[key] for input_id, key in keys.items() if key in cached}
+
+    todo = [input_id for input_id in inputs if input_id not in results]
+    if todo:
+        texts = [inputs[input_id][0] for input_id in todo]
+        metas = [inputs[input_id][1] for input_id in todo]
+        scorer = None
+        if Config.SERVING_ENGINE == 'compiled' and vectorizer is not None:
+            scorer = compiled_for(snap, model_file, vectorizer, model)
+        if scorer is not None:
+            # Linear model: TF-IDF, metadata and dot product in NumPy, no sklearn overhead
+            with telemetry.timer('compiled_score'):
+                labels, probas = _score(scorer, texts, metas)
+        else:
+            X = texts
+            if vectorizer is not None:
+                with telemetry.timer('vectorize'):
+                    X = vectorize(vectorizer, texts, metas)
+            with telemetry.timer('predict_proba'):
+                labels, probas = _score(model, X)
+        telemetry.count('predictions_scored', len(todo))
+        scored = {
+            input_id: {'label': str(label), 'probability': float(p), 'model': model_file}
+            for input_id, label, p in zip(todo, labels, probas)
+        }
+        if Config.PREDICTION_CACHE_ENABLED:
+            prediction_cache.put_many({keys[input_id]: result for input_id, result in scored.items()}, snap.version)
+        results.update(scored)
+
+    return [dict(results[input_id]) for input_id in ids]
+
+def predict_batch(texts, algo_name=None, metadata=None):
+    """Score a list of texts with one transform and one predict_proba call.
+
+    `metadata`, if given, is a list of per-text metadata dicts (or None).
+    Returns one result dict per text, shaped like predict_text's. Raises
+    LookupError when no vectorizer/model is available.
+    """
+    if not texts:
+        registry.resolve(algo_name)
+        return []
+    with telemetry.timer('clean'):
+        cleaned = clean_texts(texts)
+    return _predict_cleaned(cleaned, algo_name, metadata)
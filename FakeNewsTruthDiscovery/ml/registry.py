@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+import time
+from config import Config
+from ml.artifacts import load_model_file
+from ml.store import ModelStore, model_key
+from utils.telemetry import telemetry
+
+# Default model when the caller does not ask for one, in order of preference
+DEFAULT_MODELS = ['Ensemble', 'Random_Forest', 'Logistic_Regression']
+
+
+def is_text_pipeline(model):
+    # A Pipeline that starts with its own vectorizer and so needs no bound one
+    steps = getattr(model, 'steps', None)
+    return bool(steps) and hasattr(steps[0][1], 'transform') and steps[0][0] == 'vectorizer'
+
+
+class ModelSnapshot:
+    """Models, and the vectorizer each was trained with, loaded from one bundle."""
+
+    def __init__(self, signature, models, vectorizers, bundle=None):
+        self.signature = signature
+        self.models = models
+        # model key -> its vectorizer (shared objects for a shared file), or None
+        self.vectorizers = vectorizers
+        # Name of the store bundle, None for a flat models folder
+        self.bundle = bundle
+        self.loaded_at = time.time()
+        # model_file -> CompiledLinearScorer or None, filled by ml.fastpath
+        self.compiled = {}
+        # Same files -> same version in every process; used to key caches
+        self.version = hashlib.sha1(repr(sorted(signature.items())).encode()).hexdigest()[:16]
+
+    def resolve(self, algo_name=None):
+        """Return (vectorizer, model, model_file) for `algo_name` or the default model.
+
+        vectorizer is None for self-contained text pipelines (e.g. the
+        streaming model), which take cleaned text directly. Raises LookupError
+        with a user-facing message when nothing is available.
+        """
+        if algo_name:
+            key = model_key(algo_name)
+            if key not in self.models:
+                raise LookupError(f'Model {algo_name} not found.')
+        else:
+            key = next((name for name in DEFAULT_MODELS if name in self.models), None)
+            if key is None:
+                if not self.models:
+                    raise LookupError('No trained models found.')
+                key = next(iter(self.models))
+
+        model = self.models[key]
+        if is_text_pipeline(model):
+            return None, model, f'{key}.pkl'
+        vectorizer = self.vectorizers.get(key)
+        if vectorizer is None:
+            raise LookupError('Vectorizer not found. Train a model first.')
+        return vectorizer, model, f'{key}.pkl'
+
+
+class ModelRegistry:
+    """Keeps the models of the current bundle resident in memory.
+
+    Every `check_interval` seconds the registry checks which bundle the
+    store's CURRENT pointer names (or, for a flat models folder, the .pkl
+    mtimes/sizes). When it changed, the new bundle is loaded in a background
+    thread and swapped in with one assignment, so readers always see models
+    and vectorizers from the same bundle and never wait for a load.
+    """
+
+    def __init__(self, models_folder=None, check_interval=None):
+        self.models_folder = models_folder or Config.MODELS_FOLDER
+        self.store = ModelStore(self.models_folder)
+        if check_interval is None:
+            check_interval = Config.MODEL_RELOAD_INTERVAL
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        bundle = self.store.current_bundle()
+        if bundle is not None:
+            # Published bundles never change, so the name identifies the files
+            return {'bundle': bundle}
+        signature = {}
+        try:
+            entries = list(os.scandir(self.models_folder))
+        except FileNotFoundError:
+            return signature
+        for entry in entries:
+            if entry.name.endswith('.pkl') and entry.is_file():
+                st = entry.stat()
+                signature[entry.name] = (st.st_mtime_ns, st.st_size)
+        return signature
+
+    def _load(self, signature):
+        with telemetry.timer('model_load'):
+            snapshot = self._load_files(signature)
+        telemetry.count('model_loads')
+        return snapshot
+
+    def _load_files(self, signature):
+        folder, manifest = self.store.open(signature.get('bundle'))
+        loaded, models, vectorizers = {}, {}, {}
+        for key, entry in manifest['models'].items():
+            models[key] = load_model_file(os.path.join(folder, entry['file']))
+            filename = entry.get('vectorizer')
+            if filename and filename not in loaded:
+                loaded[filename] = load_model_file(os.path.join(folder, filename))
+            vectorizers[key] = loaded.get(filename)
+        return ModelSnapshot(signature, models, vectorizers, bundle=manifest['bundle'])
+
+    def _refresh(self):
+        # Caller holds self._lock
+        current = self._snapshot
+        signature = self._scan()
+        if current is None or signature != current.signature:
+            try:
+                self._snapshot = self._load(signature)
+            except Exception:
+                # A pruned bundle or a half-written flat-layout file; keep
+                # serving the old snapshot and try again on the next check.
+                if current is None:
+                    raise
+        self._last_check = time.monotonic()
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        finally:
+            self._lock.release()
+
+    def snapshot(self, algo_name=None):
+        """The current snapshot; one that has `algo_name` if CURRENT now names a bundle with it."""
+        current = self._snapshot
+        if current is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._refresh()
+            return self._snapshot
+
+        if algo_name and model_key(algo_name) not in current.models and self._scan() != current.signature:
+            # Published by another process (a training job) since the last
+            # check: load it now rather than failing until the next one.
+            self.invalidate()
+            return self._snapshot
+
+        if time.monotonic() - self._last_check >= self.check_interval and self._lock.acquire(blocking=False):
+            # Check and load off the request path; requests keep getting the
+            # current snapshot until the new one is swapped in.
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return current
+
+    def invalidate(self):
+        """Pick up a newly published bundle now rather than at the next periodic check."""
+        self._last_check = 0.0
+        if self._snapshot is not None:
+            with self._lock:
+                self._refresh()
+
+    def resolve(self, algo_name=None):
+        """Resolve `algo_name` against the current snapshot; see ModelSnapshot.resolve."""
+        return self.snapshot(algo_name).resolve(algo_name)
+
+    def stats(self):
+        current = self._snapshot
+        if current is None:
+            return {'loaded': 0}
+        return {'loaded': 1, 'bundle': current.bundle, 'version': current.version,
+                'models': len(current.models), 'snapshot_age_s': time.time() - current.loaded_at}
+
+
+registry = ModelRegistry()
+telemetry.register_collector('registry', registry.stats)
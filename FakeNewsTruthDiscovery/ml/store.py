@@ -0,0 +1,272 @@
+"""Versioned model store: every training run publishes a new bundle.
+
+    MODELS_FOLDER/
+        CURRENT                      name of the bundle being served
+        LOCK                         flock held while CURRENT is read and replaced
+        bundles/<bundle>/
+            manifest.json            model -> file, bound vectorizer, metrics row id
+            Logistic_Regression.pkl
+            vectorizer-<bundle>.pkl
+            ...
+
+A run stages its vectorizer and models in a hidden directory. Publishing
+hard-links in the files of every model the run did not retrain, writes the
+manifest, renames the directory into bundles/ and then replaces CURRENT in
+one atomic rename, all under an exclusive lock on the store so concurrent
+runs publish one after the other. Files inside a published bundle are never
+rewritten, so readers cannot see a half-written model, and each model keeps
+the vectorizer it was trained with. Old bundles stay on disk for rollback().
+
+A models folder without CURRENT (the original flat layout sharing one
+vectorizer.pkl) is still served as-is, and the first bundle carries its
+models over.
+
+    python -m ml.store list
+    python -m ml.store rollback [BUNDLE]
+    python -m ml.store prune --keep 10
+"""
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+import joblib
+from config import Config
+
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+BUNDLES_DIR = 'bundles'
+MANIFEST_FILE = 'manifest.json'
+LEGACY_VECTORIZER = 'vectorizer.pkl'
+
+
+def model_key(algo_name):
+    # 'Random Forest' -> 'Random_Forest', the model's file name without .pkl
+    return algo_name.replace(' ', '_')
+
+
+def read_manifest(folder):
+    """The bundle manifest in `folder`, or None if it has none (flat layout)."""
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return manifest if 'models' in manifest else None
+
+
+def flat_manifest(folder):
+    """Manifest for a flat models folder: every model bound to the shared vectorizer.pkl."""
+    manifest = read_manifest(folder)
+    if manifest is not None:
+        return manifest
+    try:
+        names = sorted(os.listdir(folder))
+    except FileNotFoundError:
+        names = []
+    vectorizer = LEGACY_VECTORIZER if LEGACY_VECTORIZER in names else None
+    models = {}
+    for name in names:
+        if name.endswith('.pkl') and name != LEGACY_VECTORIZER:
+            models[name[:-len('.pkl')]] = {'file': name, 'vectorizer': vectorizer, 'metrics_id': None, 'bundle': None}
+    return {'bundle': None, 'parent': None, 'models': models}
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class StagedBundle:
+    """A bundle being written by one training run; see ModelStore.stage()."""
+
+    def __init__(self, store):
+        self.store = store
+        self.name = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        os.makedirs(store.bundles_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(dir=store.bundles_dir, prefix='.staging-')
+        self.models = {}
+        self.vectorizer_count = 0
+        self.published = False
+
+    def add_vectorizer(self, vectorizer):
+        """Save a fitted vectorizer; returns the file name to bind models to."""
+        self.vectorizer_count += 1
+        suffix = f'-{self.vectorizer_count}' if self.vectorizer_count > 1 else ''
+        filename = f'vectorizer-{self.name}{suffix}.pkl'
+        joblib.dump(vectorizer, os.path.join(self.path, filename))
+        return filename
+
+    def add_model(self, algo_name, model, vectorizer_file=None, metrics_id=None):
+        # vectorizer_file is None for self-contained text pipelines
+        key = model_key(algo_name)
+        joblib.dump(model, os.path.join(self.path, f'{key}.pkl'))
+        self.models[key] = {'file': f'{key}.pkl', 'vectorizer': vectorizer_file,
+                            'metrics_id': metrics_id, 'bundle': self.name}
+
+    def publish(self):
+        """Carry over untouched models from the current bundle and make this one current."""
+        if not self.models:
+            raise ValueError('Nothing to publish')
+        # Read the parent now rather than at stage() so a run that finished
+        # meanwhile is carried over instead of dropped, and under the store
+        # lock so two runs publishing at once cannot both build on the same
+        # parent and have the later one drop the other's models.
+        with self.store.lock():
+            parent_dir, parent = self.store.current()
+            models = {}
+            for key, entry in parent['models'].items():
+                if key in self.models:
+                    continue
+                for filename in (entry['file'], entry.get('vectorizer')):
+                    if filename and not os.path.exists(os.path.join(self.path, filename)):
+                        _link_or_copy(os.path.join(parent_dir, filename), os.path.join(self.path, filename))
+                models[key] = entry
+            models.update(self.models)
+
+            manifest = {'bundle': self.name, 'parent': parent['bundle'], 'created_at': time.time(), 'models': models}
+            with open(os.path.join(self.path, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(self.path, self.store.bundle_dir(self.name))
+            self.store.set_current(self.name)
+        self.published = True
+        return self.name
+
+    def discard(self):
+        if not self.published:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Anything not explicitly published (e.g. training failed) is dropped
+        self.discard()
+        return False
+
+
+class ModelStore:
+    def __init__(self, root=None):
+        self.root = root or Config.MODELS_FOLDER
+
+    @property
+    def bundles_dir(self):
+        return os.path.join(self.root, BUNDLES_DIR)
+
+    def bundle_dir(self, bundle):
+        return os.path.join(self.bundles_dir, bundle)
+
+    def current_bundle(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def open(self, bundle):
+        """(folder, manifest) of `bundle`, or of the flat layout for None."""
+        if bundle is None:
+            return self.root, flat_manifest(self.root)
+        folder = self.bundle_dir(bundle)
+        manifest = read_manifest(folder)
+        if manifest is None:
+            raise LookupError(f'Bundle {bundle} not found.')
+        return folder, manifest
+
+    def current(self):
+        """(folder, manifest) of the bundle being served."""
+        return self.open(self.current_bundle())
+
+    def model_path(self, algo_name):
+        """Path of `algo_name`'s file in the current bundle, or None."""
+        folder, manifest = self.current()
+        entry = manifest['models'].get(model_key(algo_name))
+        return os.path.join(folder, entry['file']) if entry else None
+
+    def stage(self):
+        return StagedBundle(self)
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock on the store, held while CURRENT is read and replaced."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def set_current(self, bundle):
+        if read_manifest(self.bundle_dir(bundle)) is None:
+            raise LookupError(f'Bundle {bundle} not found.')
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(bundle)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    def bundles(self):
+        """Manifests of all published bundles, newest first."""
+        try:
+            names = [n for n in os.listdir(self.bundles_dir) if not n.startswith('.')]
+        except FileNotFoundError:
+            return []
+        manifests = [m for m in (read_manifest(self.bundle_dir(n)) for n in names) if m is not None]
+        return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+    def rollback(self, bundle=None):
+        """Serve `bundle` again, by default the parent of the current one. Returns its name."""
+        with self.lock():
+            if bundle is None:
+                _, manifest = self.current()
+                bundle = manifest.get('parent')
+                if bundle is None:
+                    raise LookupError('The current bundle has no parent to roll back to.')
+            self.set_current(bundle)
+        return bundle
+
+    def prune(self, keep):
+        """Delete all but the newest `keep` bundles; never the current one."""
+        removed = []
+        with self.lock():
+            current = self.current_bundle()
+            for manifest in self.bundles()[keep:]:
+                if manifest['bundle'] != current:
+                    shutil.rmtree(self.bundle_dir(manifest['bundle']))
+                    removed.append(manifest['bundle'])
+        return removed
+
+
+model_store = ModelStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List, roll back or prune model bundles.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list')
+    rollback = sub.add_parser('rollback')
+    rollback.add_argument('bundle', nargs='?')
+    prune = sub.add_parser('prune')
+    prune.add_argument('--keep', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = model_store.current_bundle()
+        for manifest in model_store.bundles():
+            marker = '*' if manifest['bundle'] == current else ' '
+            print(f"{marker} {manifest['bundle']}  {', '.join(sorted(manifest['models']))}")
+    elif args.command == 'rollback':
+        print(f'Now serving {model_store.rollback(args.bundle)}')
+    else:
+        for bundle in model_store.prune(args.keep):
+            print(f'Removed {bundle}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,37 @@
 import pandas as pd
 import numpy as np
 import pickle
-import os
-import re
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier, VotingClassifier
-from xgboost import XGBClassifier
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 from config import Config
-from utils.metrics import save_model_metrics, log_training
-import joblib
+from ml.preprocess import clean_series
+from utils.metrics import save_model_metrics, save_model_metrics_batch, log_training
+from ml.registry import registry
+from ml.store import model_store
+from ml.features import build_vectorizer, fit_vectorize, vectorize
+from utils.ingest import METADATA_COLUMNS
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils import Bunch
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import confusion_matrix
 
-# Ensure models directory exists
-if not os.path.exists(Config.MODELS_FOLDER):
-    os.makedirs(Config.MODELS_FOLDER)
+ALGORITHMS = ['Logistic Regression', 'SVM', 'Linear SVM', 'Random Forest', 'XGBoost', 'Ensemble']
 
-VECTORIZER_PATH = os.path.join(Config.MODELS_FOLDER, 'vectorizer.pkl')
+# Trained chunk by chunk by train_streaming rather than by train_algorithm
+STREAMING_ALGORITHM = 'Streaming SGD'
 
-def clean_text(text):
-    text = str(text).lower()
-    text = re.sub(r'\W', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text
+# Base models of the soft-voting Ensemble, as (estimator name, algorithm)
+ENSEMBLE_MEMBERS = [('lr', 'Logistic Regression'), ('rf', 'Random Forest'), ('svm', Config.ENSEMBLE_SVM)]
+
+# These parallelise internally via n_jobs; the rest get a process each
+N_JOBS_ALGORITHMS = {'Random Forest', 'XGBoost', 'Linear SVM'}
 
 def load_and_preprocess(dataset_path):
     df = pd.read_csv(dataset_path)
@@ -34,40 +41,30 @@ def load_and_preprocess(dataset_path):
     if 'text' not in df.columns or 'label' not in df.columns:
         raise ValueError("Dataset must contain 'text' and 'label' columns")
         
-    df['clean_text'] = df['text'].apply(clean_text)
-    return df['clean_text'], df['label']
-
-def get_vectorizer(corpus=None):
-    if os.path.exists(VECTORIZER_PATH):
-        return joblib.load(VECTORIZER_PATH)
-    elif corpus is not None:
-        vectorizer = TfidfVectorizer(max_features=5000)
-        vectorizer.fit(corpus)
-        joblib.dump(vectorizer, VECTORIZER_PATH)
-        return vectorizer
-    else:
-        raise ValueError("Vectorizer not found and no corpus provided to fit.")
+    df['clean_text'] = clean_series(df['text'], workers=Config.PREPROCESS_WORKERS)
+    # Metadata columns the file has, for ml.features; None if it has none
+    metadata = [col for col in METADATA_COLUMNS if col in df.columns]
+    return df['clean_text'], df['label'], (df[metadata] if metadata else None)
 
-def train_algorithm(dataset_path, algo_name):
-    log_training(algo_name, "Started training...")
-    
-    X, y = load_and_preprocess(dataset_path)
-    
-    # Force fitting vectorizer on new training (or load existing if transfer learning?)
-    # For this system, we re-fit vectorizer on every train call? 
-    # Or check if exists? Let's re-fit for simplicity of "Model Training" action.
-    vectorizer = TfidfVectorizer(max_features=5000)
-    X_vec = vectorizer.fit_transform(X)
-    joblib.dump(vectorizer, VECTORIZER_PATH)
-    
-    X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42)
-    
+def build_model(algo_name):
+    # Estimator libraries are imported per algorithm: xgboost alone takes
+    # longer to import than the rest of this module, and every spawned
+    # training process re-imports it.
     model = None
     if algo_name == 'Logistic Regression':
         model = LogisticRegression()
     elif algo_name == 'SVM':
+        from sklearn.svm import SVC
         model = SVC(probability=True)
+    elif algo_name == 'Linear SVM':
+        # Roughly linear-time fit and constant-time scoring per document,
+        # unlike the kernel SVC whose support vectors grow with the data.
+        # Probabilities come from a separate sigmoid calibration step.
+        from sklearn.calibration import CalibratedClassifierCV
+        from sklearn.svm import LinearSVC
+        model = CalibratedClassifierCV(LinearSVC(), method='sigmoid', cv=3)
     elif algo_name == 'Random Forest':
+        from sklearn.ensemble import RandomForestClassifier
         model = RandomForestClassifier()
     elif algo_name == 'XGBoost':
         # Encoding labels for XGBoost if necessary (e.g. Real/Fake to 0/1)
@@ -76,23 +73,69 @@ def train_algorithm(dataset_path, algo_name):
         # Let's add a quick check/conversion.
         # For simplicity, assuming dataset is prepared or strings work (sklearn handles strings for some, XGB needs numeric).
         # We will wrap XGB with LabelEncoder logic if needed, but for now stick to standard sklearn compatible
+        from xgboost import XGBClassifier
         model = XGBClassifier(use_label_encoder=False, eval_metric='logloss')
         # Note: y might need to be numeric for XGB
         # We'll rely on pd.factorize or LabelEncoder if it fails.
     elif algo_name == 'Ensemble':
+        from sklearn.ensemble import VotingClassifier
         clf1 = LogisticRegression()
-        clf2 = RandomForestClassifier()
-        clf3 = SVC(probability=True)
+        clf2 = build_model('Random Forest')
+        clf3 = build_model(Config.ENSEMBLE_SVM)
         model = VotingClassifier(estimators=[('lr', clf1), ('rf', clf2), ('svm', clf3)], voting='soft')
     else:
         raise ValueError(f"Unknown algorithm: {algo_name}")
-        
-    # Handle Label Encoding for XGBoost manually if needed
-    # For safety, let's map y to integers if they are strings
-    # But for a generic demo, we try-catch or assume numeric. 
-    # Let's map unique labels to 0, 1 just in case
-    # y_train_mapped = ...
+    return model
+
+def evaluate(model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred, average='weighted'),
+        'precision': precision_score(y_test, y_pred, average='weighted', zero_division=0),
+        'recall': recall_score(y_test, y_pred, average='weighted', zero_division=0)
+    }
+
+def serving_cost(vectorizer, model, texts, samples=50):
+    """What serving a model costs: input features, pickled size and per-request latency.
+
+    Latency is the median time to vectorize and score one of `texts` on its
+    own, the way an unbatched request is served.
+    """
+    size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    if vectorizer is not None:
+        size += len(pickle.dumps(vectorizer, protocol=pickle.HIGHEST_PROTOCOL))
+    score = model.predict_proba if hasattr(model, 'predict_proba') else model.predict
+    n_features, timings = None, []
+    for text in list(texts)[:samples]:
+        start = time.perf_counter()
+        X = vectorize(vectorizer, [text]) if vectorizer is not None else [text]
+        score(X)
+        timings.append(time.perf_counter() - start)
+        n_features = X.shape[1] if vectorizer is not None else n_features
+    return {'n_features': n_features, 'size_bytes': size,
+            'latency_ms': float(np.median(timings)) * 1000 if timings else None}
+
+def train_algorithm(dataset_path, algo_name, progress=None):
+    # `progress`, if given, is called with (fraction_done, message) between stages
+    report = progress or (lambda fraction, message: None)
+    log_training(algo_name, "Started training...")
+    
+    X, y, metadata = load_and_preprocess(dataset_path)
+    report(0.2, "Dataset loaded")
+    
+    # Force fitting vectorizer on new training (or load existing if transfer learning?)
+    # For this system, we re-fit vectorizer on every train call? 
+    # Or check if exists? Let's re-fit for simplicity of "Model Training" action.
+    vectorizer = build_vectorizer(TfidfVectorizer(max_features=Config.TFIDF_MAX_FEATURES), metadata)
+    X_vec = fit_vectorize(vectorizer, X, metadata)
+    report(0.3, "Text vectorized")
+    
+    X_train, X_test, _, texts_test, y_train, y_test = train_test_split(X_vec, X, y, test_size=0.2, random_state=42)
     
+    model = build_model(algo_name)
+        
+    report(0.4, f"Fitting {algo_name}")
     try:
         model.fit(X_train, y_train)
     except Exception as e:
@@ -100,23 +143,214 @@ def train_algorithm(dataset_path, algo_name):
         log_training(algo_name, f"Training failed: {e}")
         raise e
 
-    y_pred = model.predict(X_test)
-    
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred, average='weighted')
-    prec = precision_score(y_test, y_pred, average='weighted', zero_division=0)
-    rec = recall_score(y_test, y_pred, average='weighted', zero_division=0)
+    report(0.8, "Evaluating")
+    metrics = evaluate(model, X_test, y_test)
+    cost = serving_cost(vectorizer, model, texts_test)
     
-    # Save model
-    model_path = os.path.join(Config.MODELS_FOLDER, f"{algo_name.replace(' ', '_')}.pkl")
-    joblib.dump(model, model_path)
+    # Publish the model together with the vectorizer it was trained on
+    with model_store.stage() as bundle:
+        metrics_id = save_model_metrics(algo_name, metrics['accuracy'], metrics['f1'], metrics['precision'],
+                                        metrics['recall'], bundle=bundle.name, extra=cost)
+        bundle.add_model(algo_name, model, bundle.add_vectorizer(vectorizer), metrics_id)
+        bundle.publish()
+    # Serve the new bundle right away instead of waiting for the next check
+    registry.invalidate()
     
-    log_training(algo_name, f"Training completed. Accuracy: {acc:.4f}")
-    save_model_metrics(algo_name, acc, f1, prec, rec)
+    log_training(algo_name, f"Training completed. Accuracy: {metrics['accuracy']:.4f}")
     
+    return metrics
+
+def _fit(model, X, y):
+    model.fit(X, y)
+    return model
+
+def prefitted_ensemble(fitted, y_train):
+    """Soft-voting Ensemble assembled from already fitted base models.
+
+    VotingClassifier has no prefit option, so set the attributes fit() would.
+    """
+    ensemble = build_model('Ensemble')
+    members = [(short, fitted[algo]) for short, algo in ENSEMBLE_MEMBERS]
+    ensemble.estimators = members
+    ensemble.estimators_ = [model for _, model in members]
+    ensemble.named_estimators_ = Bunch(**dict(members))
+    ensemble.le_ = LabelEncoder().fit(y_train)
+    ensemble.classes_ = ensemble.le_.classes_
+    return ensemble
+
+def train_all(dataset_path, algorithms=None, progress=None):
+    """Train several algorithms off a single load/clean/vectorize/split pass.
+
+    Estimators with n_jobs use every core in this process while the others
+    are fitted concurrently in a process pool. The Ensemble reuses the fitted
+    LR/RF/SVM models. Returns {algo_name: metrics}; an algorithm that fails is
+    logged and reported as {'error': message} without stopping the others.
+    """
+    report = progress or (lambda fraction, message: None)
+    algorithms = list(algorithms or ALGORITHMS)
+    for algo_name in algorithms:
+        build_model(algo_name)  # reject unknown names before doing any work
+    log_training('All', f"Started training: {', '.join(algorithms)}")
+
+    X, y, metadata = load_and_preprocess(dataset_path)
+    report(0.1, "Dataset loaded")
+
+    vectorizer = build_vectorizer(TfidfVectorizer(max_features=Config.TFIDF_MAX_FEATURES), metadata)
+    X_vec = fit_vectorize(vectorizer, X, metadata)
+    report(0.2, "Text vectorized")
+
+    X_train, X_test, _, texts_test, y_train, y_test = train_test_split(X_vec, X, y, test_size=0.2, random_state=42)
+
+    to_fit = [a for a in algorithms if a != 'Ensemble']
+    if 'Ensemble' in algorithms:
+        to_fit += [algo for _, algo in ENSEMBLE_MEMBERS if algo not in to_fit]
+
+    fitted, errors = {}, {}
+    pooled = [a for a in to_fit if a not in N_JOBS_ALGORITHMS]
+    report(0.3, f"Fitting {', '.join(to_fit)}")
+    with ProcessPoolExecutor(max_workers=max(1, len(pooled)),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {a: pool.submit(_fit, build_model(a), X_train, y_train) for a in pooled}
+        for algo_name in to_fit:
+            if algo_name in futures:
+                continue
+            model = build_model(algo_name)
+            model.set_params(n_jobs=-1)
+            try:
+                fitted[algo_name] = _fit(model, X_train, y_train)
+            except Exception as e:
+                errors[algo_name] = str(e)
+        for algo_name, future in futures.items():
+            try:
+                fitted[algo_name] = future.result()
+            except Exception as e:
+                errors[algo_name] = str(e)
+
+    if 'Ensemble' in algorithms:
+        missing = [algo for _, algo in ENSEMBLE_MEMBERS if algo not in fitted]
+        if missing:
+            errors['Ensemble'] = f"Base model(s) failed: {', '.join(missing)}"
+        else:
+            fitted['Ensemble'] = prefitted_ensemble(fitted, y_train)
+    report(0.8, "Evaluating")
+
+    results, costs = {}, {}
+    for algo_name in algorithms:
+        if algo_name in errors:
+            log_training(algo_name, f"Training failed: {errors[algo_name]}")
+            results[algo_name] = {'error': errors[algo_name]}
+            continue
+        results[algo_name] = evaluate(fitted[algo_name], X_test, y_test)
+        costs[algo_name] = serving_cost(vectorizer, fitted[algo_name], texts_test)
+    trained = [algo_name for algo_name in algorithms if algo_name in fitted]
+    if not trained:
+        return results
+
+    # Every model of the run goes into one bundle, sharing one vectorizer file
+    with model_store.stage() as bundle:
+        rows = [(a, results[a]['accuracy'], results[a]['f1'], results[a]['precision'], results[a]['recall'], costs[a])
+                for a in trained]
+        metrics_ids = save_model_metrics_batch(rows, bundle=bundle.name)
+        vectorizer_file = bundle.add_vectorizer(vectorizer)
+        for algo_name, metrics_id in zip(trained, metrics_ids):
+            bundle.add_model(algo_name, fitted[algo_name], vectorizer_file, metrics_id)
+        bundle.publish()
+    registry.invalidate()
+
+    for algo_name in trained:
+        log_training(algo_name, f"Training completed. Accuracy: {results[algo_name]['accuracy']:.4f}")
+    return results
+
+def metrics_from_confusion(cm):
+    """Accuracy and support-weighted F1/precision/recall from a confusion matrix."""
+    cm = np.asarray(cm, dtype=float)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+    total = support.sum()
+    weights = support / total if total else support
     return {
-        'accuracy': acc,
-        'f1': f1,
-        'precision': prec,
-        'recall': rec
+        'accuracy': float(tp.sum() / total) if total else 0.0,
+        'f1': float(np.dot(weights, f1)),
+        'precision': float(np.dot(weights, precision)),
+        'recall': float(np.dot(weights, recall))
     }
+
+def streaming_parts():
+    # Stateless hashed features: models trained at different times on
+    # different data always share the same feature space.
+    vectorizer = HashingVectorizer(n_features=Config.HASHING_N_FEATURES, alternate_sign=False, norm='l2')
+    model = SGDClassifier(loss='log_loss', random_state=42)
+    return vectorizer, model
+
+def _is_test_row(index):
+    # Deterministic ~20% holdout that does not need the whole file in memory
+    return (index.to_numpy() * 2654435761 % 2 ** 32) % 5 == 0
+
+def train_streaming(dataset_path, progress=None, chunk_size=None):
+    """Train on a CSV of any size with bounded memory.
+
+    Chunks are cleaned and hashed with a stateless HashingVectorizer, so no
+    vocabulary has to be fitted up front, and fed to SGDClassifier.partial_fit.
+    A second pass over the holdout rows accumulates a confusion matrix for the
+    metrics. The vectorizer and classifier are saved together as one
+    Pipeline, so this model needs no separately bound vectorizer.
+    """
+    from utils.ingest import iter_csv_chunks
+    from ml.incremental import latest_ids, save_watermarks
+
+    algo_name = STREAMING_ALGORITHM
+    report = progress or (lambda fraction, message: None)
+    log_training(algo_name, "Started training...")
+    # The uploaded rows stored so far are what this run trains on, so the
+    # incremental update (ml/incremental.py) resumes after them. It starts
+    # over on feedback, which this fresh model has not learned from.
+    seen = dict(latest_ids(), feedback=0)
+
+    # partial_fit needs every class up front; collect them from the label column
+    classes = set()
+    for chunk in iter_csv_chunks(dataset_path, chunk_size, usecols=['label']):
+        classes.update(chunk['label'].dropna().astype(str))
+    classes = np.array(sorted(classes))
+    report(0.1, f"Found {len(classes)} classes")
+
+    vectorizer, model = streaming_parts()
+
+    def chunks():
+        for chunk in iter_csv_chunks(dataset_path, chunk_size, usecols=['text', 'label']):
+            chunk = chunk.dropna(subset=['label'])
+            yield chunk, _is_test_row(chunk.index)
+
+    rows = 0
+    for chunk, test in chunks():
+        train = chunk[~test]
+        if len(train):
+            X = vectorizer.transform(clean_series(train['text']))
+            model.partial_fit(X, train['label'].astype(str), classes=classes)
+        rows += len(chunk)
+        report(0.2, f"Trained on {rows} rows")
+
+    report(0.8, "Evaluating")
+    cm = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for chunk, test in chunks():
+        holdout = chunk[test]
+        if len(holdout):
+            y_pred = model.predict(vectorizer.transform(clean_series(holdout['text'])))
+            cm += confusion_matrix(holdout['label'].astype(str), y_pred, labels=classes)
+    metrics = metrics_from_confusion(cm)
+
+    pipeline = Pipeline([('vectorizer', vectorizer), ('clf', model)])
+    with model_store.stage() as bundle:
+        metrics_id = save_model_metrics(algo_name, metrics['accuracy'], metrics['f1'], metrics['precision'],
+                                        metrics['recall'], bundle=bundle.name)
+        bundle.add_model(algo_name, pipeline, metrics_id=metrics_id)
+        bundle.publish()
+    save_watermarks(algo_name, seen)
+    registry.invalidate()
+
+    log_training(algo_name, f"Training completed on {rows} rows. Accuracy: {metrics['accuracy']:.4f}")
+    return metrics
@@ -0,0 +1,86 @@
+"""Model prewarming and readiness for serving workers.
+
+A fresh worker otherwise pays for the ml.predict imports, loading every
+model of the current bundle and sklearn's first-call overhead on its first
+prediction request. create_app() calls start_prewarm() to do all of that up
+front: in a background thread by default (PREWARM_MODELS=background), so
+the worker binds at once and /ready answers 503 until the models are warm,
+or before returning (blocking). With 'off' models load on first use.
+"""
+import threading
+import time
+from config import Config
+
+WARMUP_TEXT = 'warm up'
+
+# mode None: start_prewarm() was never called and models load on first use
+_state = {'status': 'ready', 'mode': None, 'error': None, 'models': [], 'timings': {}}
+_lock = threading.Lock()
+
+
+def prewarm():
+    """Import the serving path, load the current bundle and score one text with every model."""
+    timings = {}
+    start = time.perf_counter()
+    from ml.predict import predict_batch  # noqa: F401
+    from ml.registry import registry
+    from ml.features import vectorize
+    from ml.fastpath import compiled_for
+    if Config.BATCHING_ENABLED:
+        from ml.batcher import batcher
+        batcher._ensure_worker()
+    timings['import_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    snapshot = registry.snapshot()
+    timings['load_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in snapshot.models:
+        vectorizer, model, model_file = snapshot.resolve(name)
+        if vectorizer is None:
+            model.predict([WARMUP_TEXT])
+            continue
+        if Config.SERVING_ENGINE == 'compiled':
+            compiled_for(snapshot, model_file, vectorizer, model)
+        X = vectorize(vectorizer, [WARMUP_TEXT])
+        (model.predict_proba if hasattr(model, 'predict_proba') else model.predict)(X)
+    timings['warm_s'] = time.perf_counter() - start
+    return sorted(snapshot.models), timings
+
+
+def _run():
+    started = time.perf_counter()
+    try:
+        models, timings = prewarm()
+    except LookupError as e:
+        # No trained models yet: nothing to warm, and the admin pages must
+        # stay reachable to train one.
+        models, timings = [], {'message': str(e)}
+    except Exception as e:
+        with _lock:
+            _state.update(status='failed', error=f'{type(e).__name__}: {e}')
+        return
+    timings['total_s'] = time.perf_counter() - started
+    with _lock:
+        _state.update(status='ready', models=models, timings=timings)
+
+
+def start_prewarm(mode=None):
+    """Start prewarming once per process; mode is 'background', 'blocking' or 'off'."""
+    mode = mode or Config.PREWARM_MODELS
+    with _lock:
+        if _state['mode'] is not None:
+            return
+        _state.update(status='ready' if mode == 'off' else 'warming', mode=mode)
+    if mode == 'blocking':
+        _run()
+    elif mode != 'off':
+        threading.Thread(target=_run, name='prewarm', daemon=True).start()
+
+
+def readiness():
+    """(ready, details) for the /ready endpoint."""
+    with _lock:
+        state = dict(_state)
+    return state['status'] == 'ready', state
@@ -1,45 +1,74 @@
 // charts.js
-document.addEventListener('DOMContentLoaded', function() {
-    // Only init if canvas exists
-    var ctx1 = document.getElementById('performanceChart');
-    if (ctx1) {
-        new Chart(ctx1, {
-            type: 'bar',
-            data: {
-                labels: ['Logistic Regression', 'SVM', 'Random Forest', 'XGBoost', 'Ensemble'],
-                datasets: [{
-                    label: 'Accuracy',
-                    data: [0.85, 0.88, 0.92, 0.91, 0.94], // Placeholder data, strictly for UI demo as requested
-                    backgroundColor: [
-                        'rgba(231, 76, 60, 0.7)',
-                        'rgba(52, 152, 219, 0.7)',
-                        'rgba(46, 204, 113, 0.7)',
-                        'rgba(155, 89, 182, 0.7)',
-                        'rgba(241, 196, 15, 0.7)'
-                    ],
-                    borderColor: 'rgba(255,255,255,0.8)',
-                    borderWidth: 1
-                }]
-            },
-            options: {
-                responsive: true,
-                scales: {
-                    y: {
-                        beginAtZero: true,
-                        grid: { color: '#444' },
-                        ticks: { color: '#ddd' }
-                    },
-                    x: {
-                        grid: { color: '#444' },
-                        ticks: { color: '#ddd' }
-                    }
-                },
-                plugins: {
-                    legend: { labels: { color: 'white' } }
-                }
+// Model charts fed by the admin monitor feed (/admin/monitor/feed), which
+// carries the latest row of the models table for every algorithm.
+var CHART_COLORS = [
+    'rgba(231, 76, 60, 0.7)',
+    'rgba(52, 152, 219, 0.7)',
+    'rgba(46, 204, 113, 0.7)',
+    'rgba(155, 89, 182, 0.7)',
+    'rgba(241, 196, 15, 0.7)',
+    'rgba(26, 188, 156, 0.7)'
+];
+
+var CHART_OPTIONS = {
+    responsive: true,
+    scales: {
+        y: {
+            beginAtZero: true,
+            grid: { color: '#444' },
+            ticks: { color: '#ddd' }
+        },
+        x: {
+            grid: { color: '#444' },
+            ticks: { color: '#ddd' }
+        }
+    },
+    plugins: {
+        legend: { labels: { color: 'white' } }
+    }
+};
+
+function modelDatasets(models, fields) {
+    return fields.map(function(field, i) {
+        return {
+            label: field.charAt(0).toUpperCase() + field.slice(1),
+            data: models.map(function(model) { return model[field]; }),
+            backgroundColor: fields.length > 1 ? CHART_COLORS[i % CHART_COLORS.length]
+                                               : models.map(function(_, j) { return CHART_COLORS[j % CHART_COLORS.length]; }),
+            borderColor: 'rgba(255,255,255,0.8)',
+            borderWidth: 1
+        };
+    });
+}
+
+function drawModelChart(canvas, fields) {
+    fetch(canvas.dataset.feed)
+        .then(function(response) { return response.json(); })
+        .then(function(feed) {
+            if (!feed.models || !feed.models.length) {
+                canvas.insertAdjacentHTML('beforebegin', '<p>No trained models yet.</p>');
+                return;
             }
+            new Chart(canvas, {
+                type: 'bar',
+                data: {
+                    labels: feed.models.map(function(model) { return model.name; }),
+                    datasets: modelDatasets(feed.models, fields)
+                },
+                options: CHART_OPTIONS
+            });
         });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Only init if canvas exists
+    var performance = document.getElementById('performanceChart');
+    if (performance && performance.dataset.feed) {
+        drawModelChart(performance, ['accuracy']);
+    }
+
+    var comparison = document.getElementById('comparisonChart');
+    if (comparison && comparison.dataset.feed) {
+        drawModelChart(comparison, ['accuracy', 'f1', 'precision', 'recall']);
     }
-    
-    // Comparison Chart Logic potentially dynamically loaded in Reports page
 });
@@ -0,0 +1,52 @@
+"""The single-pass cleaner must stay byte-identical to the old two-step one."""
+import re
+import pandas as pd
+from ml.preprocess import clean_series, clean_text, clean_texts
+
+CORPUS = [
+    'BREAKING: Scientists confirm the moon is made of cheese!!!',
+    '  leading and trailing whitespace\t\tand\ntabs\r\nnewlines  ',
+    'snake_case_words __dunder__ and _underscores_ stay',
+    'Café déjà vu — naïve coöperation, façade',
+    'Straße İstanbul ΣΊΣΥΦΟΣ ǅemal',
+    '東京で地震が発生 🌋🔥 ニュース!!',
+    'مرحبا بالعالم، أخبار عاجلة',
+    'non breaking thin​zero-width spaces',
+    'combining é and precomposed é',
+    'digits 123,456.78 and ½ ² ①',
+    'emoji only 😂😂😂',
+    '',
+    '!!!???...',
+    '_',
+    12345,
+    None,
+    float('nan'),
+]
+
+
+def legacy_clean_text(text):
+    # The per-row implementation previously copied in ml/train.py and ml/predict.py
+    text = str(text).lower()
+    text = re.sub(r'\W', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text
+
+
+def test_clean_text_matches_legacy():
+    for text in CORPUS:
+        assert clean_text(text) == legacy_clean_text(text), repr(text)
+
+
+def test_clean_texts_matches_legacy():
+    expected = [legacy_clean_text(t) for t in CORPUS]
+    assert clean_texts(CORPUS) == expected
+    # Chunked across processes
+    assert clean_texts(CORPUS * 3, workers=2, chunk_size=5) == expected * 3
+
+
+def test_clean_series_matches_legacy():
+    series = pd.Series(CORPUS * 2, index=range(100, 100 + 2 * len(CORPUS)), name='text')
+    cleaned = clean_series(series)
+    assert cleaned.tolist() == series.apply(legacy_clean_text).tolist()
+    assert cleaned.index.equals(series.index)
+    assert cleaned.name == 'text'
@@ -1,13 +1,263 @@
 import sqlite3
 import os
+import sys
+import atexit
+import queue
+import threading
+import time
 from config import Config
 from datetime import datetime
+from utils.telemetry import telemetry
 
-def get_db_connection():
-    conn = sqlite3.connect(Config.DB_PATH)
+class PooledConnection(sqlite3.Connection):
+    """Connection kept open for reuse by its thread.
+
+    Call sites keep their connect/commit/close pattern: close() only rolls
+    back anything left uncommitted, like closing a real connection would.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+_local = threading.local()
+
+def _connect(path):
+    new_database = not os.path.exists(path) or os.path.getsize(path) == 0
+    conn = sqlite3.connect(path, factory=PooledConnection, timeout=Config.DB_BUSY_TIMEOUT_MS / 1000.0)
     conn.row_factory = sqlite3.Row
+    if new_database:
+        # Lets utils/maintenance.py return free pages to the filesystem. Only
+        # possible before the first table and WAL; on an existing database
+        # the pragma would wait for the write lock.
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL lets readers run alongside the single writer; NORMAL only fsyncs
+    # at checkpoints, which is still crash-safe in WAL mode.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={Config.DB_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)}')
     return conn
 
+def get_db_connection():
+    # One connection per thread (and database path), opened on first use
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(Config.DB_PATH)
+    if conn is None:
+        conn = pool[Config.DB_PATH] = _connect(Config.DB_PATH)
+    elif conn.in_transaction:
+        # Left open by a caller that returned early (e.g. on an exception)
+        conn.rollback()
+    return conn
+
+def release_connections():
+    """Roll back whatever this thread's pooled connections left uncommitted.
+
+    A pooled connection outlives the request that used it, so a transaction
+    left open would keep the write lock from every other connection. The app
+    calls this when each request ends.
+    """
+    for conn in getattr(_local, 'connections', {}).values():
+        if conn.in_transaction:
+            conn.rollback()
+
+class WriteBehindQueue:
+    """Background writer that group-commits INSERTs.
+
+    submit() returns immediately; a worker thread collects statements until
+    `batch_size` are queued or `flush_interval_ms` has passed and writes them
+    in one transaction, using executemany for runs of the same statement.
+    flush() blocks until everything submitted so far is on disk and is
+    registered to run at interpreter exit. A batch that finds the database
+    locked is retried with backoff; only rows SQLite rejects are dropped, and
+    once close() has been called, rows the database stays locked for.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size=None, flush_interval_ms=None):
+        self.batch_size = batch_size or Config.DB_WRITE_BATCH_SIZE
+        if flush_interval_ms is None:
+            flush_interval_ms = Config.DB_WRITE_FLUSH_MS
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._closing = False
+        self._lock = threading.Lock()
+
+    def submit(self, sql, params=()):
+        if not Config.DB_WRITE_BEHIND:
+            with telemetry.timer('db_write'):
+                conn = get_db_connection()
+                with conn:
+                    conn.execute(sql, params)
+                conn.close()
+            telemetry.count('db_rows_written')
+            return
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+                    self._worker.start()
+        self._queue.put((sql, params))
+
+    def flush(self):
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            # Stop retrying a locked database, so exit cannot hang on it
+            self._closing = True
+            self._queue.put(self._STOP)
+            worker.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    def stats(self):
+        return {'queue_depth': self._queue.qsize(), 'batch_size': self.batch_size}
+
+    def _write(self, batch):
+        with telemetry.timer('db_write'):
+            dropped = self._write_batch(batch)
+        telemetry.count('db_rows_written', len(batch) - dropped)
+        telemetry.count('db_write_batches')
+
+    def _write_batch(self, batch):
+        # Group consecutive identical statements so each run is one executemany
+        runs = []
+        for sql, params in batch:
+            if runs and runs[-1][0] == sql:
+                runs[-1][1].append(params)
+            else:
+                runs.append((sql, [params]))
+        try:
+            self._write_with_retry(runs)
+            return 0
+        except sqlite3.Error as e:
+            if is_transient(e):
+                print(f"Write-behind batch of {len(batch)} rows dropped at shutdown: {e}", file=sys.stderr)
+                telemetry.count('db_rows_dropped', len(batch))
+                return len(batch)
+            # Retry one by one so a single bad row does not lose the batch
+            dropped = 0
+            for sql, params in batch:
+                try:
+                    self._write_with_retry([(sql, [params])])
+                except sqlite3.Error as e:
+                    print(f"Write-behind insert dropped: {e}", file=sys.stderr)
+                    telemetry.count('db_rows_dropped')
+                    dropped += 1
+            return dropped
+
+    def _write_with_retry(self, runs):
+        # A locked/busy database (another writer held the lock past
+        # busy_timeout) is retried with backoff until the write goes through;
+        # rows are only given up on errors retrying cannot fix.
+        delay = 0.05
+        while True:
+            try:
+                conn = get_db_connection()
+                with conn:
+                    for sql, rows in runs:
+                        conn.executemany(sql, rows)
+                return
+            except sqlite3.OperationalError as e:
+                if not is_transient(e) or self._closing:
+                    raise
+                telemetry.count('db_write_retries')
+                print(f"Write-behind batch retried in {delay:.2f} s: {e}", file=sys.stderr)
+                time.sleep(delay)
+                delay = min(delay * 2, Config.DB_WRITE_MAX_BACKOFF_MS / 1000.0)
+
+def is_transient(error):
+    # SQLITE_BUSY / SQLITE_LOCKED, including their extended codes
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+write_queue = WriteBehindQueue()
+atexit.register(write_queue.close)
+telemetry.register_collector('write_queue', write_queue.stats)
+
+def parse_cursor(cursor):
+    # Keyset pagination cursor '<time>|<id>' -> (time, id); None means first page
+    if not cursor:
+        return None
+    time_value, _, row_id = cursor.rpartition('|')
+    try:
+        return time_value, int(row_id)
+    except ValueError:
+        return None
+
+def fetch_page(conn, select, order_column, where=None, params=(), cursor=None, limit=None):
+    """Run `select` (a SELECT ... FROM without WHERE/ORDER BY) one page at a time.
+
+    Rows come newest first by (order_column, id). Pages are selected by
+    seeking past the cursor rather than with OFFSET, so every page costs the
+    same however far back it is. Returns (rows, cursor of the next page or None).
+    """
+    limit = limit or Config.PAGE_SIZE
+    conditions = [where] if where else []
+    params = list(params)
+    position = parse_cursor(cursor)
+    if position:
+        conditions.append(f'({order_column}, id) < (?, ?)')
+        params += position
+    query = select
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {order_column} DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(query, params).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, f"{rows[-1][order_column]}|{rows[-1]['id']}"
+
+def add_missing_columns(cursor, table, columns):
+    # CREATE TABLE IF NOT EXISTS leaves older databases untouched, so new
+    # columns are added here. `columns` maps column name -> SQL type.
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, sql_type in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {sql_type}')
+
 def init_db():
     if not os.path.exists(os.path.dirname(Config.DB_PATH)):
         os.makedirs(os.path.dirname(Config.DB_PATH))
@@ -106,6 +356,125 @@ def init_db():
             end TIMESTAMP
         )
     ''')
+    # Background training jobs (ml/jobs.py) also record progress and outcome
+    add_missing_columns(c, 'tasks', {'progress': 'REAL', 'message': 'TEXT', 'result': 'TEXT'})
+
+    # Model store bundle (ml/store.py) each metrics row's model was published in,
+    # and what the model costs to serve (see ml.train.serving_cost)
+    add_missing_columns(c, 'models', {'bundle': 'TEXT', 'n_features': 'INTEGER', 'size_bytes': 'INTEGER',
+                                      'latency_ms': 'REAL', 'cv_score': 'REAL', 'cv_std': 'REAL'})
+
+    # Admin-confirmed labels for predictions, appended as they are given
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prediction_id INTEGER,
+            label TEXT NOT NULL,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (prediction_id) REFERENCES predictions (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Last row of each source (dataofdatasets, feedback, predictions) an
+    # incrementally updated model or index has consumed (ml/incremental.py,
+    # ml/dedup.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS training_watermarks (
+            model TEXT NOT NULL,
+            source TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            PRIMARY KEY (model, source)
+        )
+    ''')
+
+    # Every candidate evaluated by a hyperparameter search (ml/tuning.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tuning_trials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run TEXT NOT NULL,
+            algorithm TEXT NOT NULL,
+            params TEXT,
+            iteration INTEGER,
+            n_samples INTEGER,
+            mean_score REAL,
+            std_score REAL,
+            fit_time REAL,
+            rank INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # MinHash signatures of predictions and training rows, and their LSH
+    # band buckets, for near-duplicate lookups (ml/dedup.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS minhash_signatures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            label TEXT,
+            prob REAL,
+            signature BLOB NOT NULL,
+            UNIQUE (source, source_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS minhash_buckets (
+            bucket INTEGER NOT NULL,
+            doc_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, doc_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Persistent tier of the prediction cache (ml/cache.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_cache (
+            key TEXT PRIMARY KEY,
+            version TEXT,
+            label TEXT,
+            prob REAL,
+            model TEXT,
+            created_at REAL
+        )
+    ''')
+
+    # Prediction texts stored once per distinct text (sha256), and the
+    # predictions compacted into referencing them by text_hash
+    # (utils/maintenance.py). Read through predictions_with_text, which has
+    # the text either way.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_texts (
+            hash BLOB PRIMARY KEY,
+            text TEXT NOT NULL
+        )
+    ''')
+    add_missing_columns(c, 'predictions', {'text_hash': 'BLOB'})
+    c.execute('''
+        CREATE VIEW IF NOT EXISTS predictions_with_text AS
+        SELECT p.id, p.user_id, COALESCE(p.text, t.text) AS text, p.predicted_label, p.prob, p.time
+        FROM predictions p LEFT JOIN prediction_texts t ON t.hash = p.text_hash
+    ''')
+
+    # Before/after report of every maintenance run, as JSON
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            report TEXT
+        )
+    ''')
+
+    # Indexes backing the paginated list pages (newest first)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_predictions_user_time ON predictions (user_id, time)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_training_logs_time ON training_logs (time)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_models_name_trained_at ON models (name, trained_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_models_trained_at ON models (trained_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_feedback_prediction ON feedback (prediction_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_tuning_trials_run ON tuning_trials (run, algorithm)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_predictions_text_hash ON predictions (text_hash)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_prediction_cache_created_at ON prediction_cache (created_at)')
 
     conn.commit()
     conn.close()
@@ -0,0 +1,70 @@
+from config import Config
+from utils.db import get_db_connection
+
+REQUIRED_COLUMNS = ['text', 'label']
+METADATA_COLUMNS = ['author_followers', 'author_verified', 'retweets', 'likes', 'shares',
+                    'credibility_score', 'sentiment']
+
+# dataset.csv labels sentiment as text; the dataofdatasets column is REAL
+SENTIMENT_SCORES = {'negative': -1.0, 'neutral': 0.0, 'positive': 1.0}
+
+def iter_csv_chunks(filepath, chunk_size=None, usecols=None):
+    """Yield DataFrames of at most `chunk_size` rows without loading the whole file."""
+    import pandas as pd
+    return pd.read_csv(filepath, chunksize=chunk_size or Config.INGEST_CHUNK_SIZE, usecols=usecols)
+
+def validate_chunk(chunk):
+    """Return (valid rows normalised for dataofdatasets, number of rejected rows)."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Dataset must contain 'text' and 'label' columns (missing: {', '.join(missing)})")
+
+    import pandas as pd
+    valid = chunk.dropna(subset=REQUIRED_COLUMNS)
+    valid = valid[valid['text'].astype(str).str.strip() != '']
+    rejected = len(chunk) - len(valid)
+
+    rows = pd.DataFrame({'text': valid['text'].astype(str), 'label': valid['label'].astype(str)})
+    for col in METADATA_COLUMNS:
+        if col not in valid.columns:
+            rows[col] = None
+            continue
+        values = valid[col]
+        if col == 'sentiment':
+            values = values.map(lambda v: SENTIMENT_SCORES.get(str(v).strip().lower(), v))
+        rows[col] = pd.to_numeric(values, errors='coerce').astype(object).where(lambda v: v.notna(), None)
+    return rows, rejected
+
+def ingest_csv(filepath, filename, chunk_size=None):
+    """Stream an uploaded CSV into datasets/dataofdatasets one chunk at a time.
+
+    Each chunk is validated and inserted with one executemany in its own
+    transaction, so memory stays bounded by the chunk size. Returns
+    (dataset_id, rows_stored, rows_rejected); on error the partial import is
+    removed and the exception re-raised.
+    """
+    conn = get_db_connection()
+    with conn:
+        dataset_id = conn.execute('INSERT INTO datasets (filename, rows) VALUES (?, ?)', (filename, 0)).lastrowid
+
+    stored = rejected = 0
+    columns = ['text', 'label'] + METADATA_COLUMNS
+    insert = (f"INSERT INTO dataofdatasets (dataset_id, {', '.join(columns)}) "
+              f"VALUES (?, {', '.join('?' for _ in columns)})")
+    try:
+        for chunk in iter_csv_chunks(filepath, chunk_size):
+            rows, bad = validate_chunk(chunk)
+            rejected += bad
+            with conn:
+                conn.executemany(insert, ((dataset_id, *row) for row in rows.itertuples(index=False, name=None)))
+            stored += len(rows)
+        with conn:
+            conn.execute('UPDATE datasets SET rows = ? WHERE id = ?', (stored, dataset_id))
+    except Exception:
+        with conn:
+            conn.execute('DELETE FROM dataofdatasets WHERE dataset_id = ?', (dataset_id,))
+            conn.execute('DELETE FROM datasets WHERE id = ?', (dataset_id,))
+        raise
+    finally:
+        conn.close()
+    return dataset_id, stored, rejected
@@ -0,0 +1,270 @@
+"""Database maintenance: prediction text compaction, retention archiving and space reclaim.
+
+Every prediction stores the article that was checked and training logs are
+only ever appended, so fakenews.db grows without bound. A run does, in order:
+
+1. Compaction. Prediction texts move into prediction_texts, keyed by their
+   sha256, and the prediction keeps only text_hash, so an article checked
+   many times is stored once. A watermark in training_watermarks means each
+   run only reads predictions added since the previous one. New predictions
+   are still inserted with their text and compacted by the next run;
+   readers use the predictions_with_text view, which has the text either way.
+2. Archiving. Predictions older than RETENTION_DAYS that have no admin
+   feedback (feedback rows are training data, see ml/incremental.py) and
+   training logs older than that are written to Parquet under
+   ARCHIVE_FOLDER/<table>/, one file per chunk named after its id range,
+   then deleted together with texts no other prediction references. A file
+   is complete (written under a temporary name, then renamed) before any of
+   its rows are deleted. The near-duplicate index keeps its entries, so an
+   archived article is still recognised when it comes back.
+3. Reclaim. Freed pages are returned to the filesystem with
+   incremental_vacuum when the database uses auto_vacuum=INCREMENTAL (new
+   databases do). --vacuum runs a full VACUUM, which also switches an older
+   database over, but blocks writers while it runs.
+
+Every write is one transaction of at most MAINTENANCE_BATCH_SIZE rows, so the
+web workers and the write-behind queue never wait for more than one chunk.
+Database size and row counts before and after the run are printed and kept
+in maintenance_runs (shown on the admin monitor page).
+
+    python -m utils.maintenance run
+    python -m utils.maintenance run --retention-days 30 --vacuum
+    python -m utils.maintenance report
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from config import Config
+from utils.db import get_db_connection
+
+MAINTENANCE = 'Maintenance'
+
+REPORT_TABLES = ('predictions', 'prediction_texts', 'feedback', 'training_logs', 'minhash_signatures')
+# Pages returned to the filesystem per incremental_vacuum step
+VACUUM_STEP_PAGES = 2048
+
+# Clock each table's time column is written in: predictions.time is SQLite's
+# CURRENT_TIMESTAMP (UTC), training_logs.time Python's local datetime.now()
+# (utils/metrics.py). The retention cutoff is computed in the same clock.
+TIME_ZONES = {'predictions': timezone.utc, 'training_logs': None}
+
+# table -> (columns, query for rows older than a cutoff after an id)
+ARCHIVES = {
+    'predictions': (
+        ('id', 'user_id', 'text', 'predicted_label', 'prob', 'time'),
+        'SELECT id, user_id, text, predicted_label, prob, time FROM predictions_with_text '
+        'WHERE id > ? AND time < ? AND NOT EXISTS '
+        '(SELECT 1 FROM feedback WHERE feedback.prediction_id = predictions_with_text.id) '
+        'ORDER BY id LIMIT ?'),
+    'training_logs': (
+        ('id', 'algo', 'message', 'time'),
+        'SELECT id, algo, message, time FROM training_logs WHERE id > ? AND time < ? ORDER BY id LIMIT ?'),
+}
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def database_report(conn):
+    """File size, used and free bytes of the database, and row counts of REPORT_TABLES."""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    wal_path = Config.DB_PATH + '-wal'
+    return {
+        'file_bytes': os.path.getsize(Config.DB_PATH),
+        'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'used_bytes': (page_count - free_pages) * page_size,
+        'free_bytes': free_pages * page_size,
+        'rows': {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in REPORT_TABLES},
+    }
+
+
+def compact_texts(conn, batch_size):
+    """Move prediction texts added since the last run into prediction_texts."""
+    row = conn.execute('SELECT last_id FROM training_watermarks WHERE model = ? AND source = ?',
+                       (MAINTENANCE, 'predictions')).fetchone()
+    last_id = row[0] if row else 0
+    compacted = new_texts = 0
+    while True:
+        cursor = conn.execute('SELECT * FROM predictions WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size))
+        columns = [d[0] for d in cursor.description]
+        insert = f"INSERT INTO predictions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if not rows:
+            break
+        texts = {}
+        for row in rows:
+            if row['text'] is not None:
+                row['text_hash'] = text_hash(row['text'])
+                texts[row['text_hash']] = row['text']
+                row['text'] = None
+                compacted += 1
+        last_id = rows[-1]['id']
+        # The chunk is deleted and inserted again (same ids) instead of
+        # updated: an UPDATE that shrinks a row leaves its page as sparse as
+        # before, while deleting lets SQLite merge the emptied pages, so the
+        # space is freed without a VACUUM. Texts, rows and watermark commit
+        # together.
+        with conn:
+            changes = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO prediction_texts (hash, text) VALUES (?, ?)', texts.items())
+            new_texts += conn.total_changes - changes
+            conn.execute('DELETE FROM predictions WHERE id BETWEEN ? AND ?', (rows[0]['id'], last_id))
+            conn.executemany(insert, [tuple(row.values()) for row in rows])
+            conn.execute('INSERT OR REPLACE INTO training_watermarks (model, source, last_id) VALUES (?, ?, ?)',
+                         (MAINTENANCE, 'predictions', last_id))
+    return {'rows': compacted, 'new_texts': new_texts}
+
+
+def write_parquet(path, columns, rows):
+    import pandas as pd
+    tmp_path = path + '.tmp'
+    pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns).to_parquet(
+        tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def delete_rows(conn, table, ids):
+    with conn:
+        if table != 'predictions':
+            conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(row_id,) for row_id in ids])
+            return
+        # Texts of this id range; the ones still referenced are kept below
+        hashes = [row[0] for row in conn.execute(
+            'SELECT DISTINCT text_hash FROM predictions WHERE id BETWEEN ? AND ? AND text_hash IS NOT NULL',
+            (ids[0], ids[-1]))]
+        # Unless an admin confirmed it since it was exported
+        conn.executemany('DELETE FROM predictions WHERE id = ? AND NOT EXISTS '
+                         '(SELECT 1 FROM feedback WHERE prediction_id = ?)', [(i, i) for i in ids])
+        conn.executemany('DELETE FROM prediction_texts WHERE hash = ? AND NOT EXISTS '
+                         '(SELECT 1 FROM predictions WHERE text_hash = ?)', [(h, h) for h in hashes])
+
+
+def archive_table(conn, table, cutoff, folder, batch_size):
+    """Export rows of `table` older than `cutoff` to Parquet, then delete them."""
+    columns, query = ARCHIVES[table]
+    table_folder = os.path.join(folder, table)
+    os.makedirs(table_folder, exist_ok=True)
+    last_id = 0
+    archived = 0
+    files = []
+    while True:
+        rows = conn.execute(query, (last_id, cutoff, batch_size)).fetchall()
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+        # Named after the id range, so a rerun after a crash replaces the file
+        path = os.path.join(table_folder, f'{table}-{ids[0]:012d}-{ids[-1]:012d}.parquet')
+        write_parquet(path, columns, rows)
+        delete_rows(conn, table, ids)
+        files.append(os.path.relpath(path, folder))
+        archived += len(ids)
+        last_id = ids[-1]
+    return {'rows': archived, 'files': files}
+
+
+def reclaim(conn, vacuum=False):
+    """Return free pages to the filesystem; returns how ('vacuum', 'incremental') or None."""
+    if vacuum:
+        # VACUUM rebuilds the file and applies the auto_vacuum setting of the
+        # connection (INCREMENTAL, see utils/db.py) to an older database
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        return 'vacuum'
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return None
+    # In steps, so a writer never waits for all of it
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    while free_pages:
+        conn.execute(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})').fetchall()
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+    return 'incremental'
+
+
+def run(retention_days=None, batch_size=None, archive_folder=None, vacuum=False):
+    """One maintenance run; returns (and stores in maintenance_runs) its report."""
+    retention_days = Config.RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or Config.MAINTENANCE_BATCH_SIZE
+    archive_folder = archive_folder or Config.ARCHIVE_FOLDER
+    started_at = datetime.now()
+    start = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        report = {'before': database_report(conn), 'retention_days': retention_days}
+        report['compacted'] = compact_texts(conn, batch_size)
+        report['archived'] = {}
+        if retention_days > 0:
+            report['cutoff'] = {}
+            for table in ARCHIVES:
+                cutoff = datetime.now(TIME_ZONES[table]) - timedelta(days=retention_days)
+                report['cutoff'][table] = cutoff = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+                report['archived'][table] = archive_table(conn, table, cutoff, archive_folder, batch_size)
+        report['reclaimed'] = reclaim(conn, vacuum)
+        # Copy the WAL back and truncate it, or the run leaves a WAL as large
+        # as everything it rewrote
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        report['after'] = database_report(conn)
+        report['seconds'] = time.perf_counter() - start
+        with conn:
+            conn.execute('INSERT INTO maintenance_runs (started_at, finished_at, report) VALUES (?, ?, ?)',
+                         (started_at, datetime.now(), json.dumps(report)))
+    finally:
+        conn.close()
+    return report
+
+
+def _mb(n):
+    return f'{n / 1e6:.2f} MB'
+
+
+def print_report(before, after=None):
+    lines = [('database file', 'file_bytes', _mb), ('write-ahead log', 'wal_bytes', _mb),
+             ('used', 'used_bytes', _mb), ('free pages', 'free_bytes', _mb)]
+    print(f"{'':<28} {'before':>14}" + (f" {'after':>14}" if after else ''))
+    for label, key, fmt in lines:
+        print(f'{label:<28} {fmt(before[key]):>14}' + (f' {fmt(after[key]):>14}' if after else ''))
+    for table, count in before['rows'].items():
+        print(f'{table + " rows":<28} {count:>14,}' + (f" {after['rows'][table]:>14,}" if after else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run')
+    run_parser.add_argument('--retention-days', type=int, help='archive older rows (0 keeps everything)')
+    run_parser.add_argument('--batch-size', type=int)
+    run_parser.add_argument('--archive-folder')
+    run_parser.add_argument('--vacuum', action='store_true', help='full VACUUM; blocks writers while it runs')
+    sub.add_parser('report')
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        conn = get_db_connection()
+        try:
+            print_report(database_report(conn))
+        finally:
+            conn.close()
+        return
+
+    report = run(args.retention_days, args.batch_size, args.archive_folder, args.vacuum)
+    compacted = report['compacted']
+    print(f"compacted {compacted['rows']:,} prediction texts ({compacted['new_texts']:,} new distinct)")
+    for table, archived in report['archived'].items():
+        zone = 'UTC' if TIME_ZONES[table] is timezone.utc else 'local time'
+        print(f"archived {archived['rows']:,} {table} rows older than {report['cutoff'][table]} {zone} "
+              f"into {len(archived['files'])} file(s)")
+    print(f"reclaimed free pages: {report['reclaimed'] or 'no (auto_vacuum is off; run with --vacuum once)'}")
+    print(f"took {report['seconds']:.1f} s\n")
+    print_report(report['before'], report['after'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,48 @@
-from utils.db import get_db_connection
+from utils.db import get_db_connection, write_queue
 from datetime import datetime
 
 def log_training(algo, message):
+    # Group-committed in the background; see WriteBehindQueue
+    write_queue.submit('INSERT INTO training_logs (algo, message, time) VALUES (?, ?, ?)',
+                       (algo, message, datetime.now()))
+
+EXTRA_FIELDS = ('n_features', 'size_bytes', 'latency_ms', 'cv_score', 'cv_std')
+
+def save_model_metrics(name, accuracy, f1, precision, recall, bundle=None, extra=None):
+    # `bundle`: the model store bundle (ml/store.py) the model was published in
+    # `extra`: optional dict with any of EXTRA_FIELDS (serving cost from
+    # ml.train.serving_cost, cross-validated score from ml/tuning.py)
+    extra = extra or {}
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute('INSERT INTO training_logs (algo, message, time) VALUES (?, ?, ?)',
-              (algo, message, datetime.now()))
+    c.execute('INSERT INTO models (name, accuracy, f1, precision, recall, trained_at, bundle, '
+              'n_features, size_bytes, latency_ms, cv_score, cv_std) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+              (name, accuracy, f1, precision, recall, datetime.now(), bundle, *(extra.get(f) for f in EXTRA_FIELDS)))
     conn.commit()
     conn.close()
+    return c.lastrowid
 
-def save_model_metrics(name, accuracy, f1, precision, recall):
+def save_model_metrics_batch(rows, bundle=None):
+    # rows: iterable of (name, accuracy, f1, precision, recall, extra), written
+    # in one transaction. Returns the new row ids in order.
+    now = datetime.now()
     conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('INSERT INTO models (name, accuracy, f1, precision, recall, trained_at) VALUES (?, ?, ?, ?, ?, ?)',
-              (name, accuracy, f1, precision, recall, datetime.now()))
-    conn.commit()
+    with conn:
+        ids = [conn.execute('INSERT INTO models (name, accuracy, f1, precision, recall, trained_at, bundle, '
+                            'n_features, size_bytes, latency_ms, cv_score, cv_std) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (*row[:5], now, bundle, *((row[5] or {}).get(f) for f in EXTRA_FIELDS))).lastrowid
+               for row in rows]
+    conn.close()
+    return ids
+
+def save_tuning_trials(run, trials):
+    # trials: iterable of (algorithm, params_json, iteration, n_samples, mean_score, std_score, fit_time, rank)
+    conn = get_db_connection()
+    with conn:
+        conn.executemany('INSERT INTO tuning_trials (run, algorithm, params, iteration, n_samples, mean_score, '
+                         'std_score, fit_time, rank) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         [(run, *trial) for trial in trials])
     conn.close()
 
 def get_latest_metrics():
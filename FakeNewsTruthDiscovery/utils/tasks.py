@@ -0,0 +1,52 @@
+import json
+from utils.db import get_db_connection
+from datetime import datetime
+
+def create_task(name):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('INSERT INTO tasks (name, status, progress) VALUES (?, ?, ?)', (name, 'queued', 0.0))
+    task_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return task_id
+
+def update_task(task_id, status=None, progress=None, message=None, result=None, start=False, end=False):
+    fields = {}
+    if status is not None:
+        fields['status'] = status
+    if progress is not None:
+        fields['progress'] = progress
+    if message is not None:
+        fields['message'] = message
+    if result is not None:
+        fields['result'] = json.dumps(result)
+    if start:
+        fields['start'] = datetime.now()
+    if end:
+        fields['end'] = datetime.now()
+    if not fields:
+        return
+
+    assignments = ', '.join(f'"{name}" = ?' for name in fields)
+    conn = get_db_connection()
+    conn.execute(f'UPDATE tasks SET {assignments} WHERE id = ?', (*fields.values(), task_id))
+    conn.commit()
+    conn.close()
+
+def task_to_dict(row):
+    task = dict(row)
+    task['result'] = json.loads(task['result']) if task.get('result') else None
+    return task
+
+def get_task(task_id):
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    conn.close()
+    return task_to_dict(row) if row else None
+
+def list_tasks(limit=50):
+    conn = get_db_connection()
+    rows = conn.execute('SELECT * FROM tasks ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    conn.close()
+    return [task_to_dict(row) for row in rows]
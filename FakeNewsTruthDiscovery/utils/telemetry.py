@@ -0,0 +1,157 @@
+"""In-process latency histograms and counters for the serving hot path.
+
+Each stage (clean, vectorize, predict_proba, db_write, model_load, ...) has
+a histogram with fixed, geometrically spaced buckets: recording a timing is
+one bisect and two increments under a lock, with no per-sample storage.
+p50/p95/p99 are interpolated within the bucket the rank falls in, the way
+Prometheus' histogram_quantile() does, so they are accurate to a bucket
+width (a factor of sqrt(2)).
+
+Modules with stats of their own (prediction cache, model registry, queues)
+register a collector returning a dict; it is called at export time only.
+
+Every process keeps its own numbers: each web worker exports what it
+served, and training jobs running in the job pool are not included.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+
+# Upper bounds in seconds: 10us * sqrt(2)^i, up to about 2 minutes
+BUCKETS = tuple(1e-5 * math.sqrt(2) ** i for i in range(48))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = min(self.bounds[i], largest) if i < len(self.bounds) else largest
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return largest
+
+    def summary(self):
+        with self._lock:
+            count, total, largest = self.count, self.sum, self.max
+        summary = {'count': count, 'mean': total / count if count else None, 'max': largest if count else None}
+        for q in QUANTILES:
+            summary[f'p{round(q * 100)}'] = self.quantile(q)
+        return summary
+
+
+class Telemetry:
+    """Named stage histograms, counters and registered gauge collectors."""
+
+    def __init__(self, enabled=None):
+        self.enabled = Config.TELEMETRY_ENABLED if enabled is None else enabled
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def register_collector(self, name, collect):
+        # collect() -> dict of stats; its numbers are exported as <name>_<key> gauges
+        self.collectors[name] = collect
+
+    def _collect(self):
+        stats = {}
+        for name, collect in list(self.collectors.items()):
+            try:
+                stats[name] = collect()
+            except Exception as e:
+                stats[name] = {'error': str(e)}
+        return stats
+
+    def snapshot(self):
+        """Everything as one JSON-serialisable dict."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        return {
+            'uptime_s': time.time() - self.started,
+            'stages': {stage: histogram.summary() for stage, histogram in sorted(histograms.items())},
+            'counters': counters,
+            'stats': self._collect(),
+        }
+
+    def prometheus(self, prefix='fakenews'):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [f'# TYPE {prefix}_uptime_seconds gauge', f'{prefix}_uptime_seconds {time.time() - self.started:.3f}']
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+
+        lines.append(f'# TYPE {prefix}_stage_seconds histogram')
+        for stage, histogram in sorted(histograms.items()):
+            with histogram._lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, n in zip(histogram.bounds, counts):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        for name, value in sorted(counters.items()):
+            lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+        for name, stats in sorted(self._collect().items()):
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f'# TYPE {prefix}_{name}_{key} gauge', f'{prefix}_{name}_{key} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+telemetry = Telemetry()